@@ -0,0 +1,30 @@
+from tiktok_research.response_cache import ResponseCache
+
+URL = 'https://example.test/v2/research/video/query/?fields='
+BODY = {'query': {'and': []}, 'start_date': '20240101', 'end_date': '20240130', 'max_count': 100, 'cursor': '0'}
+
+
+def test_response_with_more_fields_serves_the_request(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite'))
+    cache.put(URL + 'id,view_count,username', BODY, b'page')
+    assert cache.get(URL + 'view_count,id', {**BODY, 'search_id': 'abc'}) == b'page'
+    assert (cache.hits, cache.misses) == (1, 0)
+    cache.close()
+
+
+def test_response_missing_a_field_is_a_miss_and_replaced(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite'))
+    cache.put(URL + 'id,view_count', BODY, b'narrow page')
+    assert cache.get(URL + 'id,view_count,like_count', BODY) is None
+    cache.put(URL + 'id,view_count,like_count', BODY, b'wide page')
+    assert cache.get(URL + 'id,like_count', BODY) == b'wide page'
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.close()
+
+
+def test_other_windows_and_cursors_are_misses(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite'))
+    cache.put(URL + 'id', BODY, b'page')
+    assert cache.get(URL + 'id', {**BODY, 'cursor': '100'}) is None
+    assert cache.get(URL + 'id', {**BODY, 'end_date': '20240131'}) is None
+    cache.close()
@@ -0,0 +1,45 @@
+from tiktok_research.video_index import SeenVideoIndex
+
+JANUARY = ('20240101', '20240131')
+FEBRUARY = ('20240201', '20240229')
+
+
+def ids(videos):
+    return [video['id'] for video in videos]
+
+
+def videos(*video_ids):
+    return [{'id': video_id} for video_id in video_ids]
+
+
+def test_repeats_are_dropped_and_counted_per_window():
+    for index in (SeenVideoIndex(), SeenVideoIndex(bloom_capacity=1000)):
+        assert ids(index.add_new(videos(1, 2, 2), JANUARY)) == [1, 2]
+        assert ids(index.add_new(videos(2, 3), FEBRUARY)) == [3]
+        assert index.duplicates_by_window == {JANUARY: 1, FEBRUARY: 1}
+
+
+def test_sqlite_index_is_reset_without_resume(tmp_path):
+    path = str(tmp_path / 'seen.sqlite')
+    index = SeenVideoIndex(path=path)
+    index.add_new(videos(1, 2), JANUARY)
+    index.close()
+
+    index = SeenVideoIndex(path=path)
+    assert ids(index.add_new(videos(1, 2), FEBRUARY)) == [1, 2]
+    index.close()
+
+
+def test_resumed_sqlite_index_keeps_ids_with_the_window_that_wrote_them(tmp_path):
+    path = str(tmp_path / 'seen.sqlite')
+    index = SeenVideoIndex(path=path)
+    index.add_new(videos(1, 2), JANUARY)
+    index.add_new(videos(3), FEBRUARY)
+    index.close()
+
+    # The resumed run writes every window again: January keeps its own ids once, February only its new ones
+    index = SeenVideoIndex(path=path, resume=True)
+    assert ids(index.add_new(videos(1, 2, 1), JANUARY)) == [1, 2]
+    assert ids(index.add_new(videos(1, 3, 4), FEBRUARY)) == [3, 4]
+    assert index.duplicate_count == 2
+    index.close()
@@ -0,0 +1,106 @@
+import csv
+import glob
+import os
+import pytest
+from tiktok_research.video_sinks import merge_video_output, open_video_sink
+
+COLUMNS = ['id', 'create_time', 'view_count']
+
+
+def video(video_id, view_count, create_time=1704067200):
+    return {'id': video_id, 'create_time': create_time, 'view_count': view_count}
+
+
+def write_output(output_format, path, windows):
+    with open_video_sink(output_format, str(path), COLUMNS) as sink:
+        for window, videos in windows.items():
+            sink.write_videos(videos, window)
+
+
+def read_csv(path):
+    with open(f'{path}.csv', newline='', encoding='utf-8') as csv_file:
+        return [(int(row['id']), int(row['view_count'])) for row in csv.DictReader(csv_file)]
+
+
+def read_parquet(path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    rows = {}
+    for file in sorted(glob.glob(os.path.join(str(path), 'window=*', '*.parquet'))):
+        table = pq.read_table(file).to_pydict()
+        rows.setdefault(os.path.basename(os.path.dirname(file)), []).extend(zip(table['id'], table['view_count']))
+    return {partition: sorted(partition_rows) for partition, partition_rows in rows.items()}
+
+
+def test_merge_without_existing_output_renames_the_increment(tmp_path):
+    write_output('csv', tmp_path / 'increment', {('20240101', '20240131'): [video(1, 10)]})
+    assert merge_video_output('csv', str(tmp_path / 'increment'), str(tmp_path / 'output'), COLUMNS) == 0
+    assert read_csv(tmp_path / 'output') == [(1, 10)]
+    assert not os.path.exists(tmp_path / 'increment.csv')
+
+
+def test_csv_merge_replaces_videos_fetched_again(tmp_path):
+    write_output('csv', tmp_path / 'output', {('20240101', '20240131'): [video(1, 10), video(2, 20), video(3, 30)]})
+    write_output('csv', tmp_path / 'increment', {('20240129', '20240131'): [video(2, 25), video(4, 40)]})
+
+    assert merge_video_output('csv', str(tmp_path / 'increment'), str(tmp_path / 'output'), COLUMNS) == 1
+    assert read_csv(tmp_path / 'output') == [(1, 10), (3, 30), (2, 25), (4, 40)]
+    assert not os.path.exists(tmp_path / 'increment.csv')
+
+
+def test_csv_merge_refuses_other_columns(tmp_path):
+    with open_video_sink('csv', str(tmp_path / 'output'), ['id', 'view_count']) as sink:
+        sink.write_videos([video(1, 10)])
+    write_output('csv', tmp_path / 'increment', {('20240101', '20240131'): [video(1, 15)]})
+    with pytest.raises(ValueError):
+        merge_video_output('csv', str(tmp_path / 'increment'), str(tmp_path / 'output'), COLUMNS)
+
+
+def test_parquet_merge_replaces_videos_fetched_again(tmp_path):
+    pytest.importorskip('pyarrow')
+    write_output('parquet', tmp_path / 'output', {('20240101', '20240131'): [video(1, 10), video(2, 20)],
+                                                  ('20240201', '20240229'): [video(3, 30)]})
+    write_output('parquet', tmp_path / 'increment', {('20240129', '20240131'): [video(2, 25)],
+                                                     ('20240201', '20240229'): [video(3, 35), video(4, 40)]})
+
+    assert merge_video_output('parquet', str(tmp_path / 'increment'), str(tmp_path / 'output'), COLUMNS) == 2
+    assert read_parquet(tmp_path / 'output') == {
+        'window=20240101-20240131': [(1, 10)],
+        'window=20240129-20240131': [(2, 25)],
+        'window=20240201-20240229': [(3, 35), (4, 40)],
+    }
+    assert not os.path.exists(tmp_path / 'increment')
+
+
+def test_parquet_merge_only_reads_partitions_overlapping_the_increment(tmp_path):
+    pytest.importorskip('pyarrow')
+    # The same id in a partition outside the increment's windows is left alone: it is never opened
+    write_output('parquet', tmp_path / 'output', {('20240101', '20240131'): [video(1, 10)],
+                                                  ('20240201', '20240229'): [video(1, 11), video(2, 20)]})
+    write_output('parquet', tmp_path / 'increment', {('20240201', '20240210'): [video(1, 12)]})
+
+    assert merge_video_output('parquet', str(tmp_path / 'increment'), str(tmp_path / 'output'), COLUMNS) == 1
+    assert read_parquet(tmp_path / 'output') == {
+        'window=20240101-20240131': [(1, 10)],
+        'window=20240201-20240210': [(1, 12)],
+        'window=20240201-20240229': [(2, 20)],
+    }
+
+
+def test_parquet_sink_replaces_an_existing_dataset(tmp_path):
+    pytest.importorskip('pyarrow')
+    write_output('parquet', tmp_path / 'output', {('20240101', '20240130'): [video(1, 10)], ('20240131', '20240131'): [video(2, 20)]})
+    write_output('parquet', tmp_path / 'output', {('20240105', '20240131'): [video(1, 11), video(2, 21)]})
+    assert read_parquet(tmp_path / 'output') == {'window=20240105-20240131': [(1, 11), (2, 21)]}
+
+
+def test_parquet_partition_written_again_keeps_every_page(tmp_path):
+    pytest.importorskip('pyarrow')
+    january, february = ('20240101', '20240131'), ('20240201', '20240229')
+    with open_video_sink('parquet', str(tmp_path / 'output'), COLUMNS) as sink:
+        sink.write_videos([video(1, 10)], january)
+        sink.write_videos([video(2, 20)], january)
+        sink.write_videos([video(3, 30)], february)
+        sink.write_videos([video(4, 40)], january)
+    assert read_parquet(tmp_path / 'output') == {'window=20240101-20240131': [(1, 10), (2, 20), (4, 40)],
+                                                 'window=20240201-20240229': [(3, 30)]}
+    assert sorted(os.listdir(tmp_path / 'output' / 'window=20240101-20240131')) == ['part-0.parquet', 'part-1.parquet']
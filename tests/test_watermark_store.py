@@ -0,0 +1,59 @@
+import datetime
+from tiktok_research.crawler import plan_date_windows
+from tiktok_research.watermark_store import WatermarkStore, crawl_key, plan_incremental_windows, recrawl_start
+
+
+def day(value):
+    return datetime.datetime.strptime(value, "%Y%m%d")
+
+
+def test_recrawl_start_without_watermark_or_days():
+    assert recrawl_start(None, 3) is None
+    assert recrawl_start(day('20240310').timestamp(), 0) is None
+
+
+def test_recrawl_start_counts_back_from_the_watermark_day():
+    watermark = day('20240310').replace(hour=15, minute=30).timestamp()
+    assert recrawl_start(watermark, 1) == day('20240310')
+    assert recrawl_start(watermark, 3) == day('20240308')
+
+
+def test_first_run_plans_the_whole_range():
+    assert plan_incremental_windows(day('20240115'), day('20240310'), []) == plan_date_windows(day('20240115'), day('20240310'))
+
+
+def test_completed_windows_are_skipped():
+    completed = [(day('20240101'), day('20240130')), (day('20240131'), day('20240131'))]
+    assert plan_incremental_windows(day('20240101'), day('20240310'), completed) == [
+        (day('20240201'), day('20240229')), (day('20240301'), day('20240310'))]
+
+
+def test_gaps_between_completed_windows_are_planned():
+    completed = [(day('20240101'), day('20240110')), (day('20240121'), day('20240131'))]
+    assert plan_incremental_windows(day('20240101'), day('20240131'), completed) == [(day('20240111'), day('20240120'))]
+
+
+def test_everything_completed_plans_nothing():
+    completed = [(day('20240101'), day('20240131'))]
+    assert plan_incremental_windows(day('20240105'), day('20240125'), completed) == []
+
+
+def test_recrawl_reopens_completed_days():
+    completed = [(day('20240101'), day('20240131'))]
+    assert plan_incremental_windows(day('20240101'), day('20240205'), completed, recrawl_from=day('20240129')) == [
+        (day('20240129'), day('20240131')), (day('20240201'), day('20240205'))]
+
+
+def test_store_records_windows_and_keeps_the_highest_watermark(tmp_path):
+    store = WatermarkStore(str(tmp_path / 'state.sqlite'))
+    key = crawl_key({'and': []}, [], ['csv', 'out'])
+    assert store.watermark(key) is None
+    assert store.completed_windows(key) == []
+
+    store.record_run(key, [(day('20240101'), day('20240131'))], 1706000000)
+    store.record_run(key, [(day('20240201'), day('20240210'))], 1705000000)
+    store.record_run(key, [], None)
+    assert store.watermark(key) == 1706000000
+    assert sorted(store.completed_windows(key)) == [(day('20240101'), day('20240131')), (day('20240201'), day('20240210'))]
+    assert store.completed_windows(crawl_key({'and': []}, [], ['parquet', 'out'])) == []
+    store.close()
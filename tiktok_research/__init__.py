@@ -0,0 +1,18 @@
+# Crawl the TikTok research API for filtered videos, past its 30 day query limit.
+# Run it with python -m tiktok_research {single,range,target} --help, or drive VideoCrawler directly.
+
+from .async_crawler import AsyncVideoCrawler, retrieve_batch_async, retrieve_batch_in_event_loop
+from .checkpoint_store import CheckpointStore
+from .crawl_metrics import CrawlMetrics
+from .crawl_progress import CrawlProgress
+from .crawler import PageFetchError, VideoCrawler, build_query_params, retrieve_batch_concurrently, plan_date_windows, split_date_window
+from .filter_engine import compile_filter
+from .query_planner import VIDEO_FIELDS, plan_fields, plan_query
+from .request_log import RequestLog
+from .response_cache import ResponseCache
+from .retry_policy import RateLimiter
+from .token_manager import TokenManager
+from .video_index import SeenVideoIndex
+from .video_record import VideoRecord, video_to_dict
+from .video_sinks import merge_video_output, open_video_sink, video_url
+from .watermark_store import WatermarkStore, plan_incremental_windows
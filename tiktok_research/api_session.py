@@ -0,0 +1,68 @@
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+# Shared HTTP session so every API call reuses pooled keep-alive connections
+# instead of paying a TCP+TLS handshake per request.
+DEFAULT_POOL_SIZE = 10
+
+# Seconds to wait for a connection and then between bytes of a response. A stalled connection raises
+# requests' Timeout, which the retry policy backs off on, instead of hanging a worker forever.
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_READ_TIMEOUT = 60.0
+
+# API host; point TIKTOK_API_BASE_URL at a local mock server to crawl without spending quota
+API_BASE_URL = os.environ.get('TIKTOK_API_BASE_URL', 'https://open.tiktokapis.com').rstrip('/')
+
+_session = None
+_session_lock = threading.Lock()
+_timeout = (DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT)
+
+
+# Session that applies the configured (connect, read) timeout to every call made without its own
+class _TimeoutSession(requests.Session):
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', _timeout)
+        return super().request(method, url, **kwargs)
+
+
+# Build a session whose connection pool holds up to pool_size connections per host
+def _build_session(pool_size, gzip):
+    session = _TimeoutSession()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers['Connection'] = 'keep-alive'
+    session.headers['Accept-Encoding'] = 'gzip, deflate' if gzip else 'identity'
+    return session
+
+
+# Size the shared pool for the crawler's concurrency. Call before starting workers.
+def configure_session(pool_size=DEFAULT_POOL_SIZE, gzip=True):
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = _build_session(pool_size, gzip)
+    return _session
+
+
+# Set the (connect, read) timeout of every API call, token refreshes included
+def configure_timeout(connect=DEFAULT_CONNECT_TIMEOUT, read=DEFAULT_READ_TIMEOUT):
+    global _timeout
+    _timeout = (connect, read)
+
+
+# (connect, read) timeout in seconds, for clients that do not go through the shared session
+def get_timeout():
+    return _timeout
+
+
+# Return the shared session, creating it with default settings on first use
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = _build_session(DEFAULT_POOL_SIZE, True)
+        return _session
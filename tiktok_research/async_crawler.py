@@ -0,0 +1,213 @@
+import asyncio
+import collections
+import json
+import sys
+from .api_session import get_timeout
+from .checkpoint_store import SPLIT
+from .crawler import (PageFetchError, PageRequest, VideoCrawler, WindowPaging, WindowSchedule, probe_max_pages,
+                      resume_window, split_date_window, window_pages)
+from .retry_policy import RETRYABLE_EXCEPTIONS
+
+try:
+    import aiohttp
+except ImportError:  # The asyncio engine is optional
+    aiohttp = None
+
+# Asyncio engine: the request/retry and cursor-paging core of VideoCrawler on aiohttp. Every window's
+# cursor chain is a task on one event loop, so a single thread keeps hundreds of windows (across queries)
+# in flight; the limit is the connection pool, not an OS thread per window. Cancelling a window's task
+# stops it at its next await, leaving it in progress in the checkpoint for --resume.
+# Synchronous callers use retrieve_batch_in_event_loop or AsyncVideoCrawler.retrieve_windows_concurrently,
+# which behave like their threaded counterparts in crawler.py.
+
+# Failures that are worth retrying: aiohttp's network errors, plus those of the requests-based token refresh
+ASYNC_RETRYABLE_EXCEPTIONS = (aiohttp.ClientError, asyncio.TimeoutError, *RETRYABLE_EXCEPTIONS) if aiohttp is not None else ()
+
+# What the retry policy needs of a response: its status, headers and the body already read
+AsyncResponse = collections.namedtuple('AsyncResponse', ['status_code', 'headers', 'content'])
+
+
+# One pooled keep-alive client session for a whole crawl, with up to max_connections connections and the
+# same connect/read timeouts as the requests session. There is no total timeout: time spent waiting for a
+# free connection in the pool is not a stalled request.
+def open_async_session(max_connections):
+    if aiohttp is None:
+        raise ImportError("The asyncio engine requires aiohttp (pip install aiohttp)")
+    connect_timeout, read_timeout = get_timeout()
+    connector = aiohttp.TCPConnector(limit=max_connections, limit_per_host=max_connections)
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=connect_timeout, sock_read=read_timeout)
+    return aiohttp.ClientSession(connector=connector, timeout=timeout, headers={'Accept-Encoding': 'gzip, deflate'})
+
+
+# VideoCrawler whose pages are fetched with coroutines. Response handling, paging bookkeeping, the response
+# cache, metrics and checkpoints are VideoCrawler's own; only the waiting (requests, backoff, the rate limiter)
+# moves onto the event loop, and the blocking SQLite and decode steps run in worker threads so they never stall it.
+# The synchronous methods still work for single and target mode.
+class AsyncVideoCrawler(VideoCrawler):
+    def __init__(self, *args, **kwargs):
+        if aiohttp is None:
+            raise ImportError("The asyncio engine requires aiohttp (pip install aiohttp)")
+        super().__init__(*args, **kwargs)
+
+    # POST a page request with a bearer token, refreshing and retrying once if the API answers 401
+    async def post_async(self, session, body):
+        data = json.dumps(body)
+        for _ in range(2):
+            token = await self.token_manager.get_token_async()
+            headers = {'Content-Type': 'application/json', 'Authorization': f'Bearer {token}'}
+            async with session.post(self.query_url, data=data, headers=headers) as response:
+                result = AsyncResponse(response.status, response.headers, await response.read())
+            if result.status_code != 401:
+                break
+            self.token_manager.invalidate(token)
+        return result
+
+    # request_page as a coroutine. Returns (total_videos, filtered_videos, next_cursor, has_more, search_id),
+    # or raises PageFetchError.
+    async def request_page_async(self, session, query_params, cursor, search_id, request_number):
+        page_request = PageRequest(query_params, cursor, search_id, request_number)
+
+        if self.response_cache is not None:
+            page = await asyncio.to_thread(self.cached_page, page_request)
+            if page is not None:
+                return page
+
+        while page_request.attempt < self.retries:
+            page_request.start_wait()
+            await self.rate_limiter.acquire_async()
+            page_request.start_request()
+            try:
+                response = await self.post_async(session, page_request.body)
+            except ASYNC_RETRYABLE_EXCEPTIONS as e:
+                page_request.end_request()
+                delay = self.network_error_delay(page_request, e)
+            else:
+                page_request.end_request()
+                page, delay = await asyncio.to_thread(self.handle_response, page_request, response)
+                if page is not None:
+                    return page
+            if delay is None:
+                break
+            await asyncio.sleep(delay)
+
+        return self.give_up(page_request)
+
+    # iter_window_pages as an async generator, yielding (request_info, filtered_batch) for each page.
+    # Cancellation replaces stop_event: the window stops at its next await.
+    async def iter_window_pages_async(self, session, query, start_date, end_date, cursor=0, search_id=None, request_count=0,
+                                      max_pages=None, checkpoint=None):
+        paging = WindowPaging(self, query, start_date, end_date, cursor, search_id, request_count, max_pages)
+        try:
+            while paging.next_request():
+                page = await self.request_page_async(session, paging.query_params, paging.cursor, paging.search_id, paging.request_count)
+                request_info, filtered_batch = paging.page_done(page)
+                if checkpoint is not None:
+                    await asyncio.to_thread(paging.checkpoint_page, checkpoint, request_info, filtered_batch)
+                yield request_info, filtered_batch
+        finally:
+            paging.finish()
+
+    # retrieve_window as a coroutine, resuming from the checkpoint the same way.
+    # Returns (pages, request_count, videos_count, has_more, error).
+    async def retrieve_window_async(self, session, query, start_date, end_date, max_pages=None, checkpoint=None):
+        cursor, search_id, request_count, videos_count, has_more = await asyncio.to_thread(
+            resume_window, checkpoint, start_date, end_date)
+        pages = window_pages(checkpoint, start_date, end_date)
+        error = None
+        if has_more:
+            fetched_pages = self.iter_window_pages_async(session, query, start_date, end_date, cursor, search_id, request_count,
+                                                         max_pages, checkpoint)
+            try:
+                async for request_info, filtered_batch in fetched_pages:
+                    if checkpoint is None:
+                        pages.append((request_info, filtered_batch))
+                    request_count = request_info[0]
+                    videos_count += request_info[4]
+                    has_more = request_info[2]
+            except PageFetchError as e:
+                print(f"Window {start_date.strftime('%Y%m%d')}-{end_date.strftime('%Y%m%d')} failed: {e}", file=sys.stderr)
+                error = e
+            finally:
+                await fetched_pages.aclose()
+
+        return pages, request_count, videos_count, has_more, error
+
+    # retrieve_window_or_split as a coroutine: probe the window, and return it as smaller pieces if it is dense
+    async def retrieve_window_or_split_async(self, session, query, start_date, end_date, probe_pages=None, checkpoint=None):
+        # A window already split by an earlier run goes straight to its sub-windows
+        if checkpoint is not None and await asyncio.to_thread(checkpoint.window_status, start_date, end_date) == SPLIT:
+            return ([], 0, 0, SPLIT), split_date_window(start_date, end_date)
+
+        window = await self.retrieve_window_async(session, query, start_date, end_date, probe_max_pages(start_date, end_date, probe_pages),
+                                                  checkpoint)
+        return await asyncio.to_thread(self.probe_result, start_date, end_date, window, checkpoint)
+
+    # Same interface as VideoCrawler.retrieve_windows_concurrently, with max_workers windows in flight on an event loop
+    def retrieve_windows_concurrently(self, query, windows, max_workers=4, probe_pages=None, checkpoint=None, progress=None):
+        for _, window, result in retrieve_batch_in_event_loop([(self, query, windows, checkpoint)], max_workers, probe_pages, progress):
+            yield window, result
+
+
+# retrieve_batch_concurrently as an async generator: the windows of every job, each a (crawler, query, windows,
+# checkpoint) tuple with an AsyncVideoCrawler, run as tasks with at most max_in_flight at once over one shared
+# connection pool, and handed back as (job_index, window, result) in each job's date order.
+# Closing the generator early (or an error) cancels every running window.
+async def retrieve_batch_async(jobs, max_in_flight=100, probe_pages=None, progress=None):
+    schedule = WindowSchedule(jobs)
+    running = {}
+
+    async with open_async_session(max_in_flight) as session:
+        # Start the next window, if any is waiting
+        def start_next():
+            job = schedule.next_window()
+            if job is None:
+                return False
+            job_index, (start_date, end_date) = job
+            crawler, query, _, checkpoint = jobs[job_index]
+            task = asyncio.create_task(crawler.retrieve_window_or_split_async(session, query, start_date, end_date, probe_pages, checkpoint))
+            running[task] = job
+            return True
+
+        try:
+            while len(running) < max_in_flight and start_next():
+                pass
+            while running:
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    job_index, window = running.pop(task)
+                    result, sub_windows = task.result()
+                    if progress is not None:
+                        progress.window_done(len(sub_windows))
+                    for finished in schedule.finish(job_index, window, result, sub_windows):
+                        yield finished
+
+                while len(running) < max_in_flight and start_next():
+                    pass
+        finally:
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+
+
+# Drive an async iterator from synchronous code on a private event loop, yielding its items. The loop runs
+# while the next item is awaited; closing this generator closes the async iterator, cancelling its work.
+def iterate_in_event_loop(async_iterator):
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                item = loop.run_until_complete(async_iterator.__anext__())
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        try:
+            loop.run_until_complete(async_iterator.aclose())
+            loop.run_until_complete(loop.shutdown_asyncgens())
+        finally:
+            loop.close()
+
+
+# Synchronous wrapper with the interface of retrieve_batch_concurrently, so existing callers can switch engines
+def retrieve_batch_in_event_loop(jobs, max_in_flight=100, probe_pages=None, progress=None):
+    return iterate_in_event_loop(retrieve_batch_async(jobs, max_in_flight, probe_pages, progress))
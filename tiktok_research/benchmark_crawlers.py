@@ -0,0 +1,181 @@
+import argparse
+import contextlib
+import datetime
+import itertools
+import json
+import multiprocessing
+import operator
+import os
+import resource
+import tempfile
+import threading
+import time
+from .api_session import configure_session
+from .cli import DEFAULT_COLUMN_ORDER, DEFAULT_FILTER_CONDITIONS
+from .crawler import VideoCrawler, plan_date_windows
+from .mock_research_api import start_mock_server
+from .query_planner import plan_fields, plan_query
+from .retry_policy import RateLimiter
+from .token_manager import TokenManager
+from .video_index import SeenVideoIndex
+from .video_sinks import open_video_sink
+
+# End-to-end throughput benchmark for the crawl modes, run against the local mock research API
+# (python -m tiktok_research.benchmark_crawlers). Each mode runs in its own process so peak RSS is
+# measured per run, and the parse, filter and output stages are timed by wrapping the crawler's methods.
+
+CRAWLER_MODES = ['single', 'range', 'target']
+
+BENCHMARK_QUERY = {
+    "and": [
+        {"operation": "IN", "field_name": "keyword", "field_values": ["hashtag"]},
+        {"operation": "EQ", "field_name": "video_length", "field_values": ["MID"]},
+        {"operation": "IN", "field_name": "region_code", "field_values": ["US"]}
+    ]
+}
+
+
+# Accumulates time spent in each wrapped stage (summed across worker threads) plus page/video counts
+class StageTimer:
+    def __init__(self):
+        self.seconds = {}
+        self.pages = 0
+        self.videos = 0
+        self._lock = threading.Lock()
+
+    def wrap(self, stage, function):
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                with self._lock:
+                    self.seconds[stage] = self.seconds.get(stage, 0.0) + elapsed
+        return timed
+
+    # Wrap the response decoder so every decoded page is counted
+    def wrap_decoder(self, decode_response):
+        timed_decode = self.wrap('parse', decode_response)
+
+        def counting_decode(raw_response):
+            response_data = timed_decode(raw_response)
+            videos = (response_data.get('data') or {}).get('videos') if isinstance(response_data, dict) else None
+            if videos is not None:
+                with self._lock:
+                    self.pages += 1
+                    self.videos += len(videos)
+            return response_data
+        return counting_decode
+
+
+# Run one crawler mode in this process and put its measurements on result_queue
+def run_crawler(mode, base_url, settings, result_queue):
+    stages = StageTimer()
+    query, client_conditions = plan_query(BENCHMARK_QUERY, DEFAULT_FILTER_CONDITIONS)
+    crawler = VideoCrawler(
+        TokenManager('benchmark', 'benchmark', base_url=base_url),
+        client_conditions,
+        plan_fields(settings['columns'], client_conditions, required=('id', 'create_time')),
+        base_url=base_url,
+        rate_limiter=RateLimiter(daily_quota=None)  # Measure the crawler, not the client-side quota
+    )
+    crawler.decode_response = stages.wrap_decoder(crawler.decode_response)
+    crawler.filter_videos = stages.wrap('filter', crawler.filter_videos)
+
+    start_date = datetime.datetime.strptime(settings['start_date'], "%Y%m%d")
+    final_end_date = datetime.datetime.strptime(settings['end_date'], "%Y%m%d")
+    seen_index = SeenVideoIndex()
+
+    with tempfile.TemporaryDirectory() as output_directory, open(os.devnull, 'w') as devnull:
+        sink = open_video_sink(settings['output_format'], os.path.join(output_directory, f'bench_{mode}'), settings['columns'])
+        write_videos = stages.wrap('output', sink.write_videos)
+        started = time.perf_counter()
+        with sink, contextlib.redirect_stdout(devnull):
+            if mode == 'single':
+                end_date = min(start_date + datetime.timedelta(days=29), final_end_date)
+                window = (start_date.strftime("%Y%m%d"), end_date.strftime("%Y%m%d"))
+                for request_info, filtered_batch in crawler.iter_window_pages(query, start_date, end_date):
+                    write_videos(seen_index.add_new(filtered_batch, window), window)
+            elif mode == 'range':
+                configure_session(pool_size=settings['workers'])
+                windows = plan_date_windows(start_date, final_end_date)
+                for (window_start, window_end), result in crawler.retrieve_windows_concurrently(
+                        query, windows, settings['workers'], settings['probe_pages']):
+                    window = (window_start.strftime("%Y%m%d"), window_end.strftime("%Y%m%d"))
+                    for request_info, filtered_batch in result[0]:
+                        write_videos(seen_index.add_new(filtered_batch, window), window)
+            else:
+                with contextlib.closing(crawler.iter_filtered_videos(query, start_date, final_end_date)) as videos:
+                    new_videos = ((window, video) for window, video in videos if seen_index.add_new([video], window))
+                    for window, window_videos in itertools.groupby(itertools.islice(new_videos, settings['target']), key=operator.itemgetter(0)):
+                        write_videos([video for _, video in window_videos], window)
+        elapsed = time.perf_counter() - started
+        rows_written = sink.rows_written
+
+    result_queue.put({
+        'mode': mode,
+        'seconds': round(elapsed, 3),
+        'pages': stages.pages,
+        'videos': stages.videos,
+        'filtered_videos': rows_written,
+        'pages_per_sec': round(stages.pages / elapsed, 1) if elapsed else 0.0,
+        'videos_per_sec': round(stages.videos / elapsed, 1) if elapsed else 0.0,
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'parse_seconds': round(stages.seconds.get('parse', 0.0), 3),
+        'filter_seconds': round(stages.seconds.get('filter', 0.0), 3),
+        'output_seconds': round(stages.seconds.get('output', 0.0), 3),
+    })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the crawlers against the local mock research API.')
+    parser.add_argument('--modes', nargs='+', choices=CRAWLER_MODES, default=CRAWLER_MODES)
+    parser.add_argument('--start-date', default='20240101')
+    parser.add_argument('--end-date', default='20240229')
+    parser.add_argument('--videos-per-day', type=int, default=150)
+    parser.add_argument('--latency', type=float, default=0.02, help='Seconds of simulated network latency per query request')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--probe-pages', type=int, default=0)
+    parser.add_argument('--target', type=int, default=1000, help='Filtered videos wanted in target mode')
+    parser.add_argument('--output-format', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--columns', nargs='+', default=DEFAULT_COLUMN_ORDER, help='Output columns; only their fields are requested')
+    parser.add_argument('--json', help='Append one JSON line per run to this file')
+    args = parser.parse_args()
+
+    server, base_url = start_mock_server(
+        videos_per_day=args.videos_per_day, latency=args.latency,
+        rate_limit_rate=args.rate_limit_rate, retry_after=0.1
+    )
+    settings = {
+        'start_date': args.start_date,
+        'end_date': args.end_date,
+        'workers': args.workers,
+        'probe_pages': args.probe_pages,
+        'target': args.target,
+        'output_format': args.output_format,
+        'columns': args.columns,
+    }
+
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for mode in args.modes:
+        result_queue = context.Queue()
+        process = context.Process(target=run_crawler, args=(mode, base_url, settings, result_queue))
+        process.start()
+        results.append(result_queue.get())
+        process.join()
+
+    server.shutdown()
+
+    columns = ['mode', 'seconds', 'pages', 'videos', 'filtered_videos', 'pages_per_sec', 'videos_per_sec',
+               'peak_rss_mb', 'parse_seconds', 'filter_seconds', 'output_seconds']
+    print(' '.join(f'{column:>15}' for column in columns))
+    for result in results:
+        print(' '.join(f'{result[column]:>15}' for column in columns))
+
+    if args.json:
+        with open(args.json, 'a') as json_file:
+            for result in results:
+                json_file.write(json.dumps(result) + '\n')
@@ -0,0 +1,73 @@
+import argparse
+import datetime
+import gc
+import json
+import time
+import tracemalloc
+from .cli import DEFAULT_FILTER_CONDITIONS
+from .filter_engine import compile_filter
+from .json_decoding import decode_response
+from .mock_research_api import make_video
+
+# Memory benchmark for in-flight video batches: decode pages of synthetic videos as plain dicts
+# (records=False) or as VideoRecords, keep every page alive as a crawl holding them would, and report
+# the memory retained per video with tracemalloc, plus decode and filter time.
+# Run it with python -m tiktok_research.benchmark_records
+
+
+# Raw response bodies for pages of 100 synthetic videos, built before anything is measured
+def build_pages(page_count, start_day):
+    pages = []
+    for page_number in range(page_count):
+        day = start_day + datetime.timedelta(days=page_number)
+        videos = [make_video(day, index) for index in range(100)]
+        pages.append(json.dumps({"data": {"videos": videos, "cursor": 100, "has_more": True}}).encode())
+    return pages
+
+
+def measure(pages, records, video_filter):
+    gc.collect()
+    tracemalloc.start()
+    retained = []
+    decode_seconds = filter_seconds = 0.0
+    for raw_response in pages:
+        started = time.perf_counter()
+        videos = decode_response(raw_response, records=records)['data']['videos']
+        decode_seconds += time.perf_counter() - started
+        started = time.perf_counter()
+        [video for video in videos if video_filter(video)]
+        filter_seconds += time.perf_counter() - started
+        retained.append(videos)
+    retained_bytes, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    video_count = sum(len(videos) for videos in retained)
+    return {
+        'representation': 'VideoRecord' if records else 'dict',
+        'videos': video_count,
+        'retained_mb': round(retained_bytes / 1024 ** 2, 1),
+        'peak_mb': round(peak_bytes / 1024 ** 2, 1),
+        'bytes_per_video': round(retained_bytes / video_count),
+        'decode_seconds': round(decode_seconds, 3),
+        'filter_seconds': round(filter_seconds, 3),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare memory held by decoded video pages as dicts and as VideoRecords.')
+    parser.add_argument('--pages', type=int, default=200, help='Pages of 100 videos to decode and keep')
+    parser.add_argument('--json', help='Append one JSON line per representation to this file')
+    args = parser.parse_args()
+
+    pages = build_pages(args.pages, datetime.date(2024, 1, 1))
+    video_filter = compile_filter(DEFAULT_FILTER_CONDITIONS)
+    results = [measure(pages, False, video_filter), measure(pages, True, video_filter)]
+
+    columns = ['representation', 'videos', 'retained_mb', 'peak_mb', 'bytes_per_video', 'decode_seconds', 'filter_seconds']
+    print(' '.join(f'{column:>15}' for column in columns))
+    for result in results:
+        print(' '.join(f'{result[column]:>15}' for column in columns))
+
+    if args.json:
+        with open(args.json, 'a') as json_file:
+            for result in results:
+                json_file.write(json.dumps(result) + '\n')
@@ -0,0 +1,130 @@
+import json
+import sqlite3
+import threading
+from .video_record import VideoRecord, video_to_dict
+
+# Window states recorded in the checkpoint
+IN_PROGRESS = 'in_progress'
+DONE = 'done'
+SPLIT = 'split'
+
+
+# Durable SQLite record of every completed page, keyed by date window.
+# Each page is committed together with the cursor/search_id to continue from,
+# so a crawl that dies can skip finished windows and resume partially drained ones.
+class CheckpointStore:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS windows (
+                start_date TEXT NOT NULL,
+                end_date TEXT NOT NULL,
+                status TEXT NOT NULL,
+                cursor TEXT,
+                search_id TEXT,
+                PRIMARY KEY (start_date, end_date)
+            );
+            CREATE TABLE IF NOT EXISTS pages (
+                start_date TEXT NOT NULL,
+                end_date TEXT NOT NULL,
+                request_number INTEGER NOT NULL,
+                cursor TEXT,
+                has_more INTEGER,
+                search_id TEXT,
+                total_video_count INTEGER NOT NULL,
+                filtered_video_count INTEGER NOT NULL,
+                filtered_videos TEXT NOT NULL,
+                PRIMARY KEY (start_date, end_date, request_number)
+            );
+        ''')
+        self._conn.commit()
+
+    # Forget everything recorded so far (used when starting a fresh, non-resumed crawl)
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM pages')
+            self._conn.execute('DELETE FROM windows')
+
+    # Record one completed page and the cursor/search_id the window continues from
+    def record_page(self, start_date, end_date, request_info, filtered_videos, next_cursor, next_search_id, has_more):
+        request_number, cursor, _, search_id, total_video_count, filtered_video_count = request_info[:6]
+        window = (start_date.strftime("%Y%m%d"), end_date.strftime("%Y%m%d"))
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (*window, request_number, str(cursor), int(bool(has_more)), search_id,
+                 total_video_count, filtered_video_count, json.dumps([video_to_dict(video) for video in filtered_videos]))
+            )
+            self._conn.execute(
+                'INSERT OR REPLACE INTO windows VALUES (?, ?, ?, ?, ?)',
+                (*window, IN_PROGRESS if has_more else DONE, str(next_cursor), next_search_id)
+            )
+
+    # Mark a window as replaced by smaller sub-windows and drop its probed pages
+    def mark_split(self, start_date, end_date):
+        window = (start_date.strftime("%Y%m%d"), end_date.strftime("%Y%m%d"))
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM pages WHERE start_date = ? AND end_date = ?', window)
+            self._conn.execute('INSERT OR REPLACE INTO windows VALUES (?, ?, ?, NULL, NULL)', (*window, SPLIT))
+
+    # Status of a window, or None if it has not been started
+    def window_status(self, start_date, end_date):
+        window = (start_date.strftime("%Y%m%d"), end_date.strftime("%Y%m%d"))
+        with self._lock:
+            row = self._conn.execute('SELECT status FROM windows WHERE start_date = ? AND end_date = ?', window).fetchone()
+        return row[0] if row else None
+
+    # A window's recorded progress, without its videos:
+    # (status, cursor, search_id, request_count, total_video_count), or None
+    def window_state(self, start_date, end_date):
+        window = (start_date.strftime("%Y%m%d"), end_date.strftime("%Y%m%d"))
+        with self._lock:
+            state = self._conn.execute(
+                'SELECT status, cursor, search_id FROM windows WHERE start_date = ? AND end_date = ?', window
+            ).fetchone()
+            if state is None:
+                return None
+            request_count, total_video_count = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(total_video_count), 0) FROM pages WHERE start_date = ? AND end_date = ?', window
+            ).fetchone()
+
+        status, cursor, search_id = state
+        return status, int(cursor) if cursor is not None else 0, search_id, request_count, total_video_count
+
+    # Read a window's recorded pages back in request order, one page at a time, as (request_info, filtered_videos)
+    def iter_pages(self, start_date, end_date):
+        window = (start_date.strftime("%Y%m%d"), end_date.strftime("%Y%m%d"))
+        request_number = -1
+        while True:
+            with self._lock:
+                row = self._conn.execute(
+                    'SELECT request_number, cursor, has_more, search_id, total_video_count, filtered_video_count, filtered_videos '
+                    'FROM pages WHERE start_date = ? AND end_date = ? AND request_number > ? ORDER BY request_number LIMIT 1',
+                    (*window, request_number)
+                ).fetchone()
+            if row is None:
+                return
+            request_number, cursor, has_more, search_id, page_total, page_filtered, page_videos = row
+            request_info = (request_number, int(cursor), bool(has_more), search_id, page_total, page_filtered, *window)
+            yield request_info, [VideoRecord(video) for video in json.loads(page_videos)]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# The pages of a window recorded in a checkpoint store, read back from disk each time they are iterated.
+# Windows of range and batch crawls are handed on this way, so a finished window waiting to be written
+# (or one being written) holds no more than a page of videos in memory.
+class CheckpointPages:
+    def __init__(self, checkpoint, start_date, end_date):
+        self.checkpoint = checkpoint
+        self.start_date = start_date
+        self.end_date = end_date
+
+    def __iter__(self):
+        return self.checkpoint.iter_pages(self.start_date, self.end_date)
@@ -0,0 +1,582 @@
+import argparse
+import contextlib
+import datetime
+import glob
+import itertools
+import json
+import operator
+import os
+import sys
+from .api_session import API_BASE_URL, DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT, configure_session, configure_timeout
+from .async_crawler import AsyncVideoCrawler, retrieve_batch_in_event_loop
+from .checkpoint_store import IN_PROGRESS, SPLIT, CheckpointStore
+from .crawl_metrics import CrawlMetrics
+from .crawl_progress import CrawlProgress
+from .crawler import PageFetchError, VideoCrawler, plan_date_windows, retrieve_batch_concurrently
+from .query_planner import describe_plan, plan_fields, plan_query
+from .request_log import RequestLog
+from .response_cache import ResponseCache
+from .retry_policy import DAILY_REQUEST_QUOTA, RateLimiter
+from .token_manager import TokenManager
+from .video_analytics import write_analytics
+from .video_index import SeenVideoIndex
+from .video_record import video_to_dict
+from .video_sinks import merge_video_output, move_video_output, open_video_sink, video_url
+from .watermark_store import WatermarkStore, crawl_key, plan_incremental_windows, recrawl_start
+
+# Command-line entry point: python -m tiktok_research {single,range,target} ...
+#   single  one window of at most 30 days, streamed page by page
+#   range   any date range, split into windows that are crawled concurrently
+#   target  the first --target filtered videos from the start date on, stopping as soon as they are found
+#   batch   range mode for a list of queries at once, sharing one token, quota, connection pool and worker pool
+
+# Filter applied to every page unless --filter is given (see filter_engine for the supported operations).
+# plan_query pushes the conditions the API can evaluate into the query; the rest are checked client-side.
+DEFAULT_FILTER_CONDITIONS = [
+    {"operation": "GTE", "field_name": "view_count", "field_values": [5000]},
+    {"operation": "NOT_EMPTY", "field_name": "hashtag_names"},
+]
+
+# Output columns unless --columns is given. Only the fields behind them (and the filter) are downloaded.
+DEFAULT_COLUMN_ORDER = [
+    "url", "create_time", "favorites_count", "region_code", "video_description",
+    "share_count", "comment_count", "hashtag_names", "like_count", "username",
+    "id", "music_id", "video_duration", "view_count", "is_stem_verified",
+    "playlist_id", "effect_ids", "voice_to_text"
+]
+
+
+ENGINE_HELP = ('threads runs --workers windows on a thread each; asyncio runs them as tasks on one event loop '
+               '(needs aiohttp), so --workers can be in the hundreds')
+
+PROBE_PAGES_HELP = ('Split a window into days, drained concurrently, if it still has more pages after this many requests '
+                    '(default 0: never split). The probe pages are discarded and fetched again, and every day ends on a short page, '
+                    'so splitting costs quota; it helps when long cursor chains, not the quota, limit a crawl')
+
+
+def _date(value):
+    if value == 'today':
+        return datetime.datetime.combine(datetime.date.today(), datetime.time())
+    try:
+        return datetime.datetime.strptime(value, "%Y%m%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a YYYYMMDD date, got {value!r}")
+
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--start-date', type=_date, required=True, help='First day to crawl (YYYYMMDD or today)')
+    common.add_argument('--end-date', type=_date, required=True, help='Last day to crawl (YYYYMMDD or today)')
+    common.add_argument('--keywords', nargs='+', default=['hashtag'])
+    common.add_argument('--region-codes', nargs='+', default=['US'])
+    common.add_argument('--video-length', default='MID', help="SHORT, MID, LONG or EXTRA_LONG ('' for any)")
+    common.add_argument('--query', help='Full query as JSON; replaces --keywords, --region-codes and --video-length')
+    common.add_argument('--filter', help='Filter conditions as a JSON list (default: at least 5000 views and some hashtags)')
+    common.add_argument('--columns', nargs='+', default=DEFAULT_COLUMN_ORDER, help='Output columns, in order')
+    common.add_argument('--output-dir', default='.')
+    common.add_argument('--output-name', help='Output file name without extension (default: derived from the query and dates)')
+    common.add_argument('--output-format', choices=['csv', 'parquet'], default='csv',
+                        help='csv, or parquet (a dataset directory partitioned by date window)')
+    common.add_argument('--metrics-format', choices=['jsonl', 'prometheus'],
+                        help='jsonl streams per-request metrics, prometheus writes counters and histograms (next to the output)')
+    common.add_argument('--quiet', action='store_true',
+                        help='Videos go only to the output: no line per request, no JSON dump of the results at the end, '
+                             'and a live progress summary on stderr instead')
+    common.add_argument('--progress-interval', type=float, default=2.0, help='Seconds between progress updates with --quiet')
+    common.add_argument('--analytics', action='store_true',
+                        help='After the crawl, write daily, hashtag and region engagement aggregates next to the output (needs pandas)')
+    common.add_argument('--client-key', default=os.environ.get('TIKTOK_CLIENT_KEY', 'TEST'))
+    common.add_argument('--client-secret', default=os.environ.get('TIKTOK_CLIENT_SECRET', 'TEST'))
+    common.add_argument('--base-url', default=API_BASE_URL, help='API host (defaults to TIKTOK_API_BASE_URL or the TikTok API)')
+    common.add_argument('--connect-timeout', type=float, default=DEFAULT_CONNECT_TIMEOUT,
+                        help='Seconds to wait for a connection to the API before retrying')
+    common.add_argument('--read-timeout', type=float, default=DEFAULT_READ_TIMEOUT,
+                        help='Seconds to wait for data from the API before retrying the request')
+    common.add_argument('--cache', help='SQLite file caching raw API responses, reused by later runs of the same query')
+    common.add_argument('--cache-ttl', type=float, help='Seconds a cached response stays valid (default: forever)')
+    common.add_argument('--cache-max-mb', type=float, help='Evict least recently used responses beyond this size')
+    common.add_argument('--replay', action='store_true',
+                        help='Only serve pages from --cache, never the network (e.g. to re-run a crawl with a new filter)')
+    common.add_argument('--request-log-max-mb', type=float, default=10,
+                        help='Size at which the per-request log next to the output is rotated (3 old files are kept)')
+    common.add_argument('--seen-index', choices=['memory', 'sqlite', 'bloom'], default='memory',
+                        help='Where the ids of written videos are kept to drop repeats: a set in memory, <output>.seen.sqlite '
+                             '(kept by --resume), or a Bloom filter of --seen-bloom-capacity ids (drops about 0.1%% of new videos)')
+    common.add_argument('--seen-bloom-capacity', type=int, default=10_000_000, help='Videos the --seen-index bloom filter is sized for')
+    common.add_argument('--daily-quota', type=int, default=DAILY_REQUEST_QUOTA, help='Client-side request quota per day (0 for unlimited)')
+
+    parser = argparse.ArgumentParser(prog='python -m tiktok_research', description='Crawl the TikTok research API for filtered videos.')
+    modes = parser.add_subparsers(dest='mode', required=True)
+
+    single = modes.add_parser('single', parents=[common], help='One window of at most 30 days')
+    single.add_argument('--max-pages', type=int, help='Stop after this many requests')
+
+    range_mode = modes.add_parser('range', parents=[common], help='Any date range, windows crawled concurrently')
+    range_mode.add_argument('--workers', type=int, default=4, help='Date windows drained at the same time')
+    range_mode.add_argument('--probe-pages', type=int, default=0, help=PROBE_PAGES_HELP)
+    range_mode.add_argument('--resume', action='store_true', help='Continue an interrupted crawl from its checkpoint')
+    range_mode.add_argument('--engine', choices=['threads', 'asyncio'], default='threads', help=ENGINE_HELP)
+    range_mode.add_argument('--incremental', metavar='STATE_FILE',
+                            help='SQLite file with each query\'s watermark and completed windows: only fetch days earlier runs '
+                                 'have not, and merge them into the existing output')
+    range_mode.add_argument('--recrawl-days', type=int, default=0,
+                            help='With --incremental, also re-crawl this many days up to the watermark to pick up updated counts '
+                                 '(at least 1 when --end-date is today, to finish the partial day)')
+
+    target = modes.add_parser('target', parents=[common], help='The first --target filtered videos from the start date')
+    target.add_argument('--target', type=int, default=100, help='Number of filtered videos wanted')
+
+    batch = modes.add_parser('batch', parents=[common], help='Several queries over the same range, one output per query')
+    batch.add_argument('--queries', required=True,
+                       help='JSON file with a list of query specs: objects with any of name, keywords, region_codes, '
+                            'video_length, query and filter (missing keys fall back to the command line)')
+    batch.add_argument('--workers', type=int, default=4, help='Date windows drained at the same time, across all queries')
+    batch.add_argument('--probe-pages', type=int, default=0, help=PROBE_PAGES_HELP)
+    batch.add_argument('--resume', action='store_true', help='Continue an interrupted batch from its checkpoints')
+    batch.add_argument('--engine', choices=['threads', 'asyncio'], default='threads', help=ENGINE_HELP)
+    return parser
+
+
+# Query from the command line, or from a batch query spec whose keys override it:
+# either a full query verbatim or the keyword/length/region conditions. A spec without any query keys
+# (e.g. only a name and a filter) runs --query when it is given.
+def build_query(args, spec=None):
+    spec = spec or {}
+    if 'query' in spec:
+        return spec['query']
+    if args.query and not any(key in spec for key in ('keywords', 'region_codes', 'video_length')):
+        return json.loads(args.query)
+    keywords = spec.get('keywords', args.keywords)
+    video_length = spec.get('video_length', args.video_length)
+    region_codes = spec.get('region_codes', args.region_codes)
+    conditions = [{"operation": "IN", "field_name": "keyword", "field_values": keywords}]
+    if video_length:
+        conditions.append({"operation": "EQ", "field_name": "video_length", "field_values": [video_length]})
+    if region_codes:
+        conditions.append({"operation": "IN", "field_name": "region_code", "field_values": region_codes})
+    return {"and": conditions}
+
+
+# Output name of a batch query: its spec's name, or its keywords and regions
+def query_name(query, spec):
+    if spec.get('name'):
+        return spec['name']
+    for condition in query.get('and', []):
+        if condition.get('field_name') == 'region_code':
+            return f"{query_keyword(query)}_{'_'.join(condition['field_values'])}"
+    return query_keyword(query)
+
+
+# Keyword part of output filenames
+def query_keyword(query):
+    for condition in query.get('and', []):
+        if condition.get('field_name') == 'keyword':
+            return '_'.join(condition['field_values'])
+    return 'query'
+
+
+def _month(date):
+    return date.strftime("%b%Y").upper()
+
+
+# Totals of a finished crawl, preceded by the JSON dump of every filtered video when they were kept (not with --quiet)
+def print_summary(filtered_count, request_log, seen_index, filtered_videos=None):
+    if filtered_videos is not None:
+        print(json.dumps({'filtered_videos': [{**video_to_dict(video), 'url': video_url(video)} for video in filtered_videos]}))
+
+    print(f'Total videos returned: {request_log.video_count}')
+    print(f'Total filtered videos returned: {filtered_count}')
+    print(f'Total API requests made: {request_log.request_count}')
+    if request_log.discarded_request_count:
+        print(f'Probe requests discarded by window splits: {request_log.discarded_request_count}')
+    print('Selectivity by window (filtered / total videos returned):')
+    for (start_date_str, end_date_str), (filtered_video_count, total_video_count) in sorted(request_log.window_totals.items()):
+        selectivity = f'{filtered_video_count / total_video_count:.1%}' if total_video_count else 'n/a'
+        print(f'Window {start_date_str}-{end_date_str}: {filtered_video_count} / {total_video_count} ({selectivity})')
+    print(f'Duplicate videos dropped: {seen_index.duplicate_count}')
+    for (window_start_str, window_end_str), duplicate_count in sorted(seen_index.duplicates_by_window.items()):
+        print(f'Duplicates in window {window_start_str}-{window_end_str}: {duplicate_count}')
+    if request_log.path is not None:
+        print(f'Videos returned by request: see {request_log.path}')
+
+
+# Running request totals, with each request streamed to <output>.requests.log (rotated by size)
+def open_request_log(args, output_filepath):
+    return RequestLog(f'{output_filepath}.requests.log', int(args.request_log_max_mb * 1024 * 1024))
+
+
+# Index of the video ids written to an output (see --seen-index). With --resume, the SQLite index is continued.
+def open_seen_index(args, output_filepath):
+    if args.seen_index == 'sqlite':
+        return SeenVideoIndex(path=f'{output_filepath}.seen.sqlite', resume=getattr(args, 'resume', False))
+    if args.seen_index == 'bloom':
+        return SeenVideoIndex(bloom_capacity=args.seen_bloom_capacity)
+    return SeenVideoIndex()
+
+
+# Move the files written next to an output under old_filepath (<old_filepath><suffix>, with any rotated
+# copies) to the same names under new_filepath
+def move_side_files(old_filepath, new_filepath, suffixes):
+    for suffix in suffixes:
+        for path in glob.glob(glob.escape(old_filepath + suffix) + '*'):
+            os.replace(path, new_filepath + path[len(old_filepath):])
+
+
+# Live progress summary on stderr with --quiet; otherwise the per-request lines already show progress
+def open_progress(args, metrics, windows=0, target=None):
+    return CrawlProgress(metrics, windows, target, interval=args.progress_interval if args.quiet else None)
+
+
+# Filtered videos kept in memory for the JSON dump printed at the end, or None with --quiet
+def retained_videos(args):
+    return None if args.quiet else []
+
+
+# Write a finished window of a range or batch crawl to its output one page at a time, as the pages are read
+# back from the checkpoint, and log its requests (as discarded probes for a split window).
+# Returns the latest create_time written, or None if no video was.
+def write_window(pages, window, status, sink, seen_index, request_log, progress, all_filtered_videos):
+    latest_create_time = None
+    for request_info, filtered_batch in pages:
+        filtered_batch = seen_index.add_new(filtered_batch, window)
+        sink.write_videos(filtered_batch, window)
+        progress.add_videos(len(filtered_batch))
+        if filtered_batch:
+            batch_latest_create_time = max(video['create_time'] for video in filtered_batch)
+            latest_create_time = batch_latest_create_time if latest_create_time is None else max(latest_create_time, batch_latest_create_time)
+        if all_filtered_videos is not None:
+            all_filtered_videos.extend(filtered_batch)
+        request_log.record(request_info, discarded=status == SPLIT)
+    return latest_create_time
+
+
+# One window, streamed to the output one page at a time as they arrive.
+# Returns the failed windows: the window, if a page could not be fetched.
+def run_single(args, crawler, query, output_filepath):
+    all_filtered_videos = retained_videos(args)
+    request_log = open_request_log(args, output_filepath)
+    progress = open_progress(args, crawler.metrics, windows=1)
+    window = (args.start_date.strftime("%Y%m%d"), args.end_date.strftime("%Y%m%d"))
+
+    # Drop videos repeated across pages, e.g. after the cursor is reset
+    seen_index = open_seen_index(args, output_filepath)
+
+    failed_windows = []
+    with open_video_sink(args.output_format, output_filepath, args.columns) as sink, progress:
+        try:
+            for request_info, filtered_batch in crawler.iter_window_pages(query, args.start_date, args.end_date, max_pages=args.max_pages):
+                filtered_batch = seen_index.add_new(filtered_batch, window)
+                sink.write_videos(filtered_batch, window)
+                progress.add_videos(len(filtered_batch))
+                if all_filtered_videos is not None:
+                    all_filtered_videos.extend(filtered_batch)
+                request_log.record(request_info)
+        except PageFetchError as e:
+            print(f"Window {window[0]}-{window[1]} failed: {e}", file=sys.stderr)
+            failed_windows.append(e.window)
+        progress.window_done()
+    request_log.close()
+    seen_index.close()
+
+    print_summary(sink.rows_written, request_log, seen_index, all_filtered_videos)
+    return failed_windows
+
+
+# Every window of the range (or the given windows), drained concurrently and written window by window as they
+# finish. Returns (latest create_time written or None if no video was, failed windows). A failed window keeps
+# the pages it got before failing, and stays in progress in the checkpoint for --resume.
+def run_range(args, crawler, query, output_filepath, windows=None):
+    all_filtered_videos = retained_videos(args)
+    request_log = open_request_log(args, output_filepath)
+
+    # One pooled connection per worker so concurrent windows reuse keep-alive connections
+    configure_session(pool_size=args.workers)
+
+    # Every completed page is checkpointed next to the output; --resume continues an interrupted crawl
+    checkpoint = CheckpointStore(f'{output_filepath}.checkpoint.sqlite')
+    if not args.resume:
+        checkpoint.clear()
+
+    # Drop videos already written by an earlier page or window (first occurrence in date order wins).
+    # --seen-index sqlite or bloom keeps crawls too large for an in-memory set.
+    seen_index = open_seen_index(args, output_filepath)
+
+    if windows is None:
+        windows = plan_date_windows(args.start_date, args.end_date)
+    latest_create_time = None
+    failed_windows = []
+    progress = open_progress(args, crawler.metrics, len(windows))
+    with open_video_sink(args.output_format, output_filepath, args.columns) as sink, progress:
+        for (window_start, window_end), (pages, request_count, videos_count, status) in crawler.retrieve_windows_concurrently(
+                query, windows, args.workers, args.probe_pages or None, checkpoint, progress):
+            window = (window_start.strftime("%Y%m%d"), window_end.strftime("%Y%m%d"))
+            if status == IN_PROGRESS:
+                failed_windows.append(window)
+            window_latest_create_time = write_window(pages, window, status, sink, seen_index, request_log, progress, all_filtered_videos)
+            if window_latest_create_time is not None:
+                latest_create_time = window_latest_create_time if latest_create_time is None else max(latest_create_time, window_latest_create_time)
+    checkpoint.close()
+    request_log.close()
+    seen_index.close()
+
+    print_summary(sink.rows_written, request_log, seen_index, all_filtered_videos)
+    print(f"Initial start date: {args.start_date.strftime('%Y%m%d')}")
+    print(f"Final end date: {args.end_date.strftime('%Y%m%d')}")
+    return latest_create_time, failed_windows
+
+
+# Range mode for scheduled runs. The state file keeps, per query, filter and output, the watermark (latest create_time
+# written) and the windows completed so far. A run only fetches the days of the range no earlier run completed,
+# plus the last --recrawl-days days up to the watermark, into <output>.increment, and then merges that into
+# the output, replacing videos fetched again. The state is only updated once the merge is done, and only
+# with the windows that were drained: one with a failed window (or sub-window) is planned again next run.
+# Returns the failed windows.
+def run_incremental(args, crawler, query, output_filepath, filter_conditions):
+    store = WatermarkStore(args.incremental)
+    key = crawl_key(query, filter_conditions, [args.output_format, os.path.abspath(output_filepath)])
+    watermark = store.watermark(key)
+    recrawl_from = recrawl_start(watermark, args.recrawl_days)
+    windows = plan_incremental_windows(args.start_date, args.end_date, store.completed_windows(key), recrawl_from)
+
+    if watermark is not None:
+        print(f"Watermark: {datetime.datetime.fromtimestamp(watermark).strftime('%Y-%m-%d %H:%M:%S')}"
+              + (f", re-crawling from {recrawl_from.strftime('%Y%m%d')}" if recrawl_from is not None else ''))
+    if not windows:
+        print(f"Nothing to crawl: every day from {args.start_date.strftime('%Y%m%d')} to {args.end_date.strftime('%Y%m%d')} is complete")
+        store.close()
+        return []
+    print(f"Incremental crawl of {len(windows)} windows: {', '.join(f'{start:%Y%m%d}-{end:%Y%m%d}' for start, end in windows)}")
+
+    increment_filepath = f'{output_filepath}.increment'
+    latest_create_time, failed_windows = run_range(args, crawler, query, increment_filepath, windows)
+    replaced = merge_video_output(args.output_format, increment_filepath, output_filepath, args.columns)
+    drained_windows = [(start, end) for start, end in windows
+                       if not any(failed_start <= f'{end:%Y%m%d}' and f'{start:%Y%m%d}' <= failed_end for failed_start, failed_end in failed_windows)]
+    store.record_run(key, drained_windows, latest_create_time)
+    store.close()
+    print(f'Merged into {output_filepath}: {replaced} videos updated')
+    return failed_windows
+
+
+# The first args.target new filtered videos. The crawl is lazy and stops at exactly the target; closing
+# the stream afterwards means no page beyond the one holding the last wanted video is ever requested.
+# Videos go to a partial output that is renamed once the actual final end date is known.
+# Returns (output path, failed windows).
+def run_target(args, crawler, query, partial_filepath):
+    all_filtered_videos = retained_videos(args)
+    request_log = open_request_log(args, partial_filepath)
+    progress = open_progress(args, crawler.metrics, target=args.target)
+    last_video_date = None
+    failed_windows = []
+
+    # Drop videos already written by an earlier page or window
+    seen_index = open_seen_index(args, partial_filepath)
+
+    # A page that cannot be fetched ends the stream, keeping every video found before it
+    def until_failure(videos):
+        try:
+            yield from videos
+        except PageFetchError as e:
+            print(f"Crawl stopped before the target: {e}", file=sys.stderr)
+            failed_windows.append(e.window)
+
+    filtered_video_stream = crawler.iter_filtered_videos(query, args.start_date, args.end_date, request_log)
+    new_videos = until_failure((window, video) for window, video in filtered_video_stream if seen_index.add_new([video], window))
+
+    with open_video_sink(args.output_format, partial_filepath, args.columns) as sink, contextlib.closing(filtered_video_stream), progress:
+        for window, window_videos in itertools.groupby(itertools.islice(new_videos, args.target), key=operator.itemgetter(0)):
+            filtered_videos = [video for _, video in window_videos]
+            sink.write_videos(filtered_videos, window)
+            progress.add_videos(len(filtered_videos))
+            if all_filtered_videos is not None:
+                all_filtered_videos.extend(filtered_videos)
+            window_last_video_date = max(video['create_time'] for video in filtered_videos)
+            last_video_date = window_last_video_date if last_video_date is None else max(last_video_date, window_last_video_date)
+
+        if sink.rows_written >= args.target:
+            print(f"Target number of filtered videos ({args.target}) reached.")
+
+    # Determine actual final end date based on the last video retrieved
+    if last_video_date is not None:
+        actual_final_end_date = datetime.datetime.fromtimestamp(last_video_date)
+    else:
+        actual_final_end_date = args.end_date
+
+    output_name = args.output_name or f'first_{args.target}_FV_{query_keyword(query)}_{_month(args.start_date)}_TO_{_month(actual_final_end_date)}'
+    output_filepath = os.path.join(args.output_dir, output_name)
+    move_video_output(sink.path, output_filepath + ('.csv' if args.output_format == 'csv' else ''))
+
+    # The request log and seen index follow the output to its final name (main moves the metrics)
+    request_log.close()
+    seen_index.close()
+    move_side_files(partial_filepath, output_filepath, ['.requests.log', '.seen.sqlite'])
+    request_log.path = f'{output_filepath}.requests.log'
+
+    print_summary(sink.rows_written, request_log, seen_index, all_filtered_videos)
+    print(f"Initial start date: {args.start_date.strftime('%Y%m%d')}")
+    print(f"Final end date: {actual_final_end_date.strftime('%Y%m%d')}")
+    return output_filepath, failed_windows
+
+
+# Every query's windows through one shared executor, scheduled round-robin across queries, each query
+# written window by window to its own output as its windows finish. Returns the failed windows, as
+# (query name, start_date, end_date).
+def run_batch(args, batch, output_filepaths):
+    all_filtered_videos = [retained_videos(args) for _ in batch]
+    request_logs = [open_request_log(args, output_filepath) for output_filepath in output_filepaths]
+    seen_indexes = [open_seen_index(args, output_filepath) for output_filepath in output_filepaths]
+
+    # One pooled connection per worker, shared by every query
+    configure_session(pool_size=args.workers)
+
+    windows = plan_date_windows(args.start_date, args.end_date)
+    jobs = []
+    for (name, crawler, query), output_filepath in zip(batch, output_filepaths):
+        checkpoint = CheckpointStore(f'{output_filepath}.checkpoint.sqlite')
+        if not args.resume:
+            checkpoint.clear()
+        jobs.append((crawler, query, windows, checkpoint))
+
+    failed_windows = []
+
+    # Every crawler of the batch shares one CrawlMetrics
+    progress = open_progress(args, batch[0][1].metrics, len(windows) * len(batch))
+    with contextlib.ExitStack() as stack:
+        sinks = [stack.enter_context(open_video_sink(args.output_format, output_filepath, args.columns)) for output_filepath in output_filepaths]
+        stack.enter_context(progress)
+        retrieve_batch = retrieve_batch_in_event_loop if args.engine == 'asyncio' else retrieve_batch_concurrently
+        for job_index, (window_start, window_end), (pages, request_count, videos_count, status) in retrieve_batch(
+                jobs, args.workers, args.probe_pages or None, progress):
+            window = (window_start.strftime("%Y%m%d"), window_end.strftime("%Y%m%d"))
+            if status == IN_PROGRESS:
+                failed_windows.append((batch[job_index][0], *window))
+            write_window(pages, window, status, sinks[job_index], seen_indexes[job_index], request_logs[job_index], progress,
+                         all_filtered_videos[job_index])
+    for _, _, _, checkpoint in jobs:
+        checkpoint.close()
+    for request_log in request_logs:
+        request_log.close()
+    for seen_index in seen_indexes:
+        seen_index.close()
+
+    for job_index, (name, crawler, query) in enumerate(batch):
+        print(f'Query {name}:')
+        print_summary(sinks[job_index].rows_written, request_logs[job_index], seen_indexes[job_index], all_filtered_videos[job_index])
+    print(f"Initial start date: {args.start_date.strftime('%Y%m%d')}")
+    print(f"Final end date: {args.end_date.strftime('%Y%m%d')}")
+    print(f'Total API requests made across queries: {sum(request_log.request_count for request_log in request_logs)}')
+    return failed_windows
+
+
+# Run the command line. Returns the exit status: 1 if any window failed (its pages ran out of retries or
+# were refused), so schedulers notice a partial crawl, 0 otherwise.
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.end_date < args.start_date:
+        parser.error('--end-date is before --start-date')
+    if args.mode == 'single' and (args.end_date - args.start_date).days >= 30:
+        parser.error('single mode crawls at most 30 days; use range mode for longer periods')
+    if args.replay and not args.cache:
+        parser.error('--replay needs --cache')
+    if args.mode == 'range' and args.recrawl_days and not args.incremental:
+        parser.error('--recrawl-days needs --incremental')
+    if args.mode == 'range' and args.incremental and not args.recrawl_days and args.end_date >= _date('today'):
+        # Today's window would be recorded complete while the day is still going, and never fetched again
+        parser.error('--incremental up to today needs --recrawl-days 1 or more to finish the partial day on the next run')
+
+    if args.connect_timeout <= 0 or args.read_timeout <= 0:
+        parser.error('--connect-timeout and --read-timeout must be positive')
+
+    # One token, rate limiter, metrics and cache shared by every crawler of the run
+    configure_timeout(args.connect_timeout, args.read_timeout)
+    token_manager = TokenManager(args.client_key, args.client_secret, base_url=args.base_url)
+    rate_limiter = RateLimiter(daily_quota=args.daily_quota or None)
+    metrics = CrawlMetrics()
+    response_cache = None
+    if args.cache:
+        max_bytes = int(args.cache_max_mb * 1024 * 1024) if args.cache_max_mb else None
+        response_cache = ResponseCache(args.cache, args.cache_ttl, max_bytes, replay_only=args.replay)
+
+    # The asyncio engine only drives the concurrent modes
+    crawler_class = AsyncVideoCrawler if args.mode in ('range', 'batch') and args.engine == 'asyncio' else VideoCrawler
+
+    def build_crawler(query, filter_conditions):
+        # Push what the API can evaluate into the query; the rest is checked client-side
+        query, client_conditions = plan_query(query, filter_conditions)
+        print(describe_plan(filter_conditions, client_conditions))
+
+        # Only download the fields behind the output columns and the client-side filter.
+        # create_time is always fetched so target mode can tell how far the crawl has got.
+        query_fields = plan_fields(args.columns, client_conditions, required=('id', 'create_time'))
+        crawler = crawler_class(token_manager, client_conditions, query_fields, base_url=args.base_url,
+                                rate_limiter=rate_limiter, metrics=metrics, response_cache=response_cache, verbose=not args.quiet)
+        return crawler, query
+
+    filter_conditions = json.loads(args.filter) if args.filter else DEFAULT_FILTER_CONDITIONS
+
+    if args.mode == 'batch':
+        with open(args.queries) as queries_file:
+            specs = json.load(queries_file)
+        batch = []
+        for spec in specs:
+            query = build_query(args, spec)
+            name = query_name(query, spec)
+            print(f'Query {name}: ', end='')
+            crawler, query = build_crawler(query, spec.get('filter', filter_conditions))
+            batch.append((name, crawler, query))
+        names = [name for name, _, _ in batch]
+        if len(set(names)) != len(names):
+            parser.error('batch queries need distinct names (set "name" in the specs)')
+        output_filepaths = [os.path.join(args.output_dir, f'all_FV_{name}_{_month(args.start_date)}_TO_{_month(args.end_date)}') for name in names]
+        output_name = args.output_name or f'batch_{_month(args.start_date)}_TO_{_month(args.end_date)}'
+    else:
+        query = build_query(args)
+        keyword = query_keyword(query)
+        crawler, query = build_crawler(query, filter_conditions)
+        if args.mode == 'single':
+            output_name = args.output_name or f'all_FV_{keyword}_{_month(args.start_date)}'
+        elif args.mode == 'range' and args.incremental:
+            # One dataset that every scheduled run merges into, whatever its end date
+            output_name = args.output_name or f'all_FV_{keyword}_SINCE_{_month(args.start_date)}'
+        elif args.mode == 'range':
+            output_name = args.output_name or f'all_FV_{keyword}_{_month(args.start_date)}_TO_{_month(args.end_date)}'
+        else:
+            output_name = f'first_{args.target}_FV_{keyword}_{_month(args.start_date)}.partial'
+    output_filepath = os.path.join(args.output_dir, output_name)
+
+    if args.metrics_format == 'jsonl':
+        metrics.open_jsonl(f'{output_filepath}.metrics.jsonl')
+
+    if args.mode == 'single':
+        failed_windows = run_single(args, crawler, query, output_filepath)
+    elif args.mode == 'range' and args.incremental:
+        failed_windows = run_incremental(args, crawler, query, output_filepath, filter_conditions)
+    elif args.mode == 'range':
+        _, failed_windows = run_range(args, crawler, query, output_filepath)
+    elif args.mode == 'batch':
+        failed_windows = run_batch(args, batch, output_filepaths)
+    else:
+        partial_filepath = output_filepath
+        output_filepath, failed_windows = run_target(args, crawler, query, partial_filepath)
+
+    if args.analytics:
+        for analytics_filepath in output_filepaths if args.mode == 'batch' else [output_filepath]:
+            for aggregate_path in write_analytics(args.output_format, analytics_filepath, args.columns):
+                print(f'Aggregates written to {aggregate_path}')
+
+    if args.metrics_format == 'prometheus':
+        metrics.write_prometheus(f'{output_filepath}.metrics.prom')
+    metrics.close()
+    if args.mode == 'target':
+        move_side_files(partial_filepath, output_filepath, ['.metrics.jsonl'])
+    if response_cache is not None:
+        print(f'Response cache: {response_cache.hits} hits / {response_cache.misses} misses')
+        response_cache.close()
+
+    if failed_windows:
+        print(f"Failed windows, left incomplete: {', '.join('-'.join(window) for window in failed_windows)}", file=sys.stderr)
+        if args.mode in ('range', 'batch') and not getattr(args, 'incremental', None):
+            print('Run again with --resume to continue them from their last good page', file=sys.stderr)
+        return 1
+    return 0
@@ -0,0 +1,127 @@
+import bisect
+import json
+import threading
+import time
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PROCESSING_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5)
+VIDEOS_PER_PAGE_BUCKETS = (0, 10, 25, 50, 75, 100)
+
+
+# Cumulative histogram in the Prometheus style
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def prometheus_lines(self, name):
+        lines = [f'# TYPE {name} histogram']
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f'{name}_sum {self.sum}')
+        lines.append(f'{name}_count {self.count}')
+        return lines
+
+
+# Per-request and per-window crawl instrumentation: network latency, decode and filter time,
+# time spent waiting on the rate limiter or backoff, retries, bytes and videos per page.
+# Events can be streamed as JSON lines, and the totals exported as Prometheus-style text,
+# to tell whether a crawl is API-bound, parse-bound or throttled.
+class CrawlMetrics:
+    def __init__(self):
+        self.counters = {
+            'requests_total': 0,
+            'failed_requests_total': 0,
+            'retries_total': 0,
+            'bytes_received_total': 0,
+            'videos_total': 0,
+            'filtered_videos_total': 0,
+            'windows_total': 0,
+            'cache_hits_total': 0,
+        }
+        self.histograms = {
+            'request_latency_seconds': Histogram(LATENCY_BUCKETS),
+            'wait_seconds': Histogram(LATENCY_BUCKETS),
+            'decode_seconds': Histogram(PROCESSING_BUCKETS),
+            'filter_seconds': Histogram(PROCESSING_BUCKETS),
+            'videos_per_page': Histogram(VIDEOS_PER_PAGE_BUCKETS),
+        }
+        self._jsonl_file = None
+        self._lock = threading.Lock()
+
+    # Stream every request and window event to a JSON-lines file
+    def open_jsonl(self, path):
+        with self._lock:
+            self._jsonl_file = open(path, 'a', encoding='utf-8')
+
+    def _write_event(self, event):
+        if self._jsonl_file is not None:
+            self._jsonl_file.write(json.dumps(event) + '\n')
+
+    # Record one call of VideoCrawler.request_page, including all of its retries.
+    # cached marks a page served from the response cache rather than the network.
+    def record_request(self, start_date, end_date, request_number, latency_seconds, wait_seconds, decode_seconds,
+                       filter_seconds, retries, bytes_received, video_count, filtered_count, ok=True, cached=False):
+        with self._lock:
+            self.counters['requests_total'] += 1
+            self.counters['failed_requests_total'] += 0 if ok else 1
+            self.counters['retries_total'] += retries
+            self.counters['bytes_received_total'] += bytes_received
+            self.counters['videos_total'] += video_count
+            self.counters['filtered_videos_total'] += filtered_count
+            self.counters['cache_hits_total'] += 1 if cached else 0
+            self.histograms['request_latency_seconds'].observe(latency_seconds)
+            self.histograms['wait_seconds'].observe(wait_seconds)
+            self.histograms['decode_seconds'].observe(decode_seconds)
+            self.histograms['filter_seconds'].observe(filter_seconds)
+            if ok:
+                self.histograms['videos_per_page'].observe(video_count)
+            self._write_event({
+                'event': 'request', 'time': time.time(), 'start_date': start_date, 'end_date': end_date,
+                'request_number': request_number, 'ok': ok, 'latency_seconds': round(latency_seconds, 6),
+                'wait_seconds': round(wait_seconds, 6), 'decode_seconds': round(decode_seconds, 6),
+                'filter_seconds': round(filter_seconds, 6), 'retries': retries, 'bytes_received': bytes_received,
+                'videos': video_count, 'filtered_videos': filtered_count, 'cached': cached,
+            })
+
+    # Record one date window paged through by VideoCrawler.iter_window_pages
+    def record_window(self, start_date, end_date, request_count, seconds, video_count, filtered_count):
+        with self._lock:
+            self.counters['windows_total'] += 1
+            self._write_event({
+                'event': 'window', 'time': time.time(), 'start_date': start_date, 'end_date': end_date,
+                'requests': request_count, 'seconds': round(seconds, 6), 'videos': video_count,
+                'filtered_videos': filtered_count,
+            })
+
+    def prometheus_text(self, prefix='tiktok_crawl_'):
+        with self._lock:
+            lines = []
+            for name, value in self.counters.items():
+                lines.append(f'# TYPE {prefix}{name} counter')
+                lines.append(f'{prefix}{name} {value}')
+            for name, histogram in self.histograms.items():
+                lines.extend(histogram.prometheus_lines(f'{prefix}{name}'))
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        with open(path, 'w', encoding='utf-8') as prometheus_file:
+            prometheus_file.write(self.prometheus_text())
+
+    def close(self):
+        with self._lock:
+            if self._jsonl_file is not None:
+                self._jsonl_file.close()
+                self._jsonl_file = None
+
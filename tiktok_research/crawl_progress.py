@@ -0,0 +1,98 @@
+import sys
+import threading
+import time
+
+
+def _duration(seconds):
+    seconds = int(seconds)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    return f'{hours}:{minutes:02d}:{seconds:02d}' if hours else f'{minutes}:{seconds:02d}'
+
+
+# Compact live summary of a running crawl, redrawn every interval seconds on one line (a new line each
+# time when the stream is not a terminal): windows done, pages and pages/sec, videos written, and an ETA
+# from the observed page rate. Pages are read from the shared CrawlMetrics, so nothing is added to the
+# request path. The ETA assumes the remaining windows need as many pages as the finished ones did on
+# average; with a target it is the time to the target at the observed rate of written videos instead.
+# With interval=None nothing is drawn, so callers can count progress unconditionally.
+class CrawlProgress:
+    def __init__(self, metrics, windows=0, target=None, interval=2.0, stream=None):
+        self.metrics = metrics
+        self.windows_total = windows
+        self.windows_done = 0
+        self.videos_written = 0
+        self.target = target
+        self.interval = interval
+        self.stream = stream if stream is not None else sys.stderr
+        self._started = time.perf_counter()
+        self._first_page = metrics.counters['requests_total']
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    # One window finished; a window split into sub_windows finishes and adds its pieces to the total
+    def window_done(self, sub_windows=0):
+        with self._lock:
+            self.windows_done += 1
+            self.windows_total += sub_windows
+
+    def add_videos(self, count):
+        with self._lock:
+            self.videos_written += count
+
+    def summary(self):
+        elapsed = time.perf_counter() - self._started
+        pages = self.metrics.counters['requests_total'] - self._first_page
+        page_rate = pages / elapsed if elapsed > 0 else 0.0
+        with self._lock:
+            windows_done, windows_total, videos_written = self.windows_done, self.windows_total, self.videos_written
+
+        parts = []
+        if windows_total:
+            parts.append(f'{windows_done}/{windows_total} windows')
+        parts.append(f'{pages} pages ({page_rate:.1f}/s)')
+        parts.append(f'{videos_written}/{self.target} videos' if self.target else f'{videos_written} videos')
+
+        eta = None
+        if self.target:
+            if videos_written:
+                eta = max(self.target - videos_written, 0) * elapsed / videos_written
+        elif windows_done and page_rate:
+            remaining_pages = pages / windows_done * windows_total - pages
+            eta = max(remaining_pages, 0) / page_rate
+        parts.append(f'elapsed {_duration(elapsed)}')
+        parts.append(f'ETA {_duration(eta)}' if eta is not None else 'ETA --')
+        return ' | '.join(parts)
+
+    def _write(self, final=False):
+        if self.stream.isatty():
+            self.stream.write(f'\r\x1b[K{self.summary()}' + ('\n' if final else ''))
+        else:
+            self.stream.write(self.summary() + '\n')
+        self.stream.flush()
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self._write()
+
+    def start(self):
+        if self.interval is None:
+            return self
+        self._thread = threading.Thread(target=self._run, name='crawl-progress', daemon=True)
+        self._thread.start()
+        return self
+
+    # Stop redrawing and leave the final summary on its own line
+    def close(self):
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+            self._write(final=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.close()
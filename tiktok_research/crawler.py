@@ -0,0 +1,508 @@
+import collections
+import contextlib
+import datetime
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from .api_session import API_BASE_URL
+from .checkpoint_store import DONE, IN_PROGRESS, SPLIT, CheckpointPages
+from .crawl_metrics import CrawlMetrics
+from .filter_engine import compile_filter
+from .json_decoding import decode_response
+from .query_planner import VIDEO_FIELDS
+from .retry_policy import (FATAL, RATE_LIMITED, RETRYABLE_EXCEPTIONS, RateLimiter, backoff_delay, classify_response, error_details,
+                           retry_after_seconds)
+
+# Videos requested per page (the API maximum)
+MAX_COUNT = 100
+
+
+# Split the overall date range into windows of at most 30 days that never cross a month boundary
+def plan_date_windows(start_date, final_end_date):
+    windows = []
+    while start_date <= final_end_date:
+        # Calculate the next end date, ensuring it does not exceed the final_end_date or the current month's last day
+        next_month = start_date.replace(day=28) + datetime.timedelta(days=4)
+        last_day_of_month = next_month - datetime.timedelta(days=next_month.day)
+        end_date = min(start_date + datetime.timedelta(days=29), final_end_date, last_day_of_month)
+        windows.append((start_date, end_date))
+
+        start_date = end_date + datetime.timedelta(days=1)  # Move to the next date range
+    return windows
+
+
+# Split a dense window straight into single days, in one level, so the probe pages of a window are only
+# thrown away once. The API's start_date/end_date filters only have day granularity, so a day is never split further.
+def split_date_window(start_date, end_date):
+    return [(start_date + datetime.timedelta(days=offset),) * 2 for offset in range((end_date - start_date).days + 1)]
+
+
+# Build the request body for a single date window
+def build_query_params(query, start_date, end_date):
+    return {
+        "query": query,
+        "start_date": start_date.strftime("%Y%m%d"),
+        "end_date": end_date.strftime("%Y%m%d"),
+        "max_count": MAX_COUNT,
+        "is_random": False
+    }
+
+
+# Request body for one page of a window
+def page_body(query_params, cursor, search_id):
+    body = {**query_params, 'cursor': str(cursor)}
+    if search_id:
+        body['search_id'] = str(search_id)
+    return body
+
+
+# Pages to probe a window with before splitting it (None: drain it). Splitting is off unless probe_pages is set,
+# and a single day cannot be split, so it is always drained.
+def probe_max_pages(start_date, end_date, probe_pages):
+    return probe_pages if probe_pages and start_date < end_date else None
+
+
+# Cursor and search_id to request the next page of a window with
+def advance_cursor(cursor, search_id, next_cursor, new_search_id, page_size):
+    if not next_cursor:
+        # Reset cursor and search_id if invalid or expired
+        return 0, None
+    # Update cursor and search_id only if the new ones are valid
+    return (next_cursor if next_cursor else cursor + page_size), (new_search_id if new_search_id else search_id)
+
+
+# Raised when a page cannot be fetched: its retries ran out, the API refused it for good, or a replay-only cache
+# does not hold it. Unlike an empty last page, it leaves the window unfinished, to be continued by --resume.
+class PageFetchError(Exception):
+    def __init__(self, message, window):
+        super().__init__(message)
+        self.window = window  # (start_date, end_date) as YYYYMMDD strings
+
+
+# One page request on its way through its retries, with the timings accumulated for its metrics record
+class PageRequest:
+    def __init__(self, query_params, cursor, search_id, request_number):
+        self.body = page_body(query_params, cursor, search_id)
+        self.request_number = request_number
+        self.attempt = 0
+        self.latency_seconds = self.wait_seconds = self.decode_seconds = self.filter_seconds = 0.0
+        self.bytes_received = 0
+        self._started = 0.0
+
+    # Waiting for the rate limiter starts
+    def start_wait(self):
+        self._started = time.perf_counter()
+
+    # The request is sent (the wait is over)
+    def start_request(self):
+        now = time.perf_counter()
+        self.wait_seconds += now - self._started
+        self._started = now
+
+    # The response (or a network error) is back
+    def end_request(self):
+        self.latency_seconds += time.perf_counter() - self._started
+
+    # Ask for the page without its search_id from now on. Returns whether there was one to drop.
+    def drop_search_id(self):
+        return self.body.pop('search_id', None) is not None
+
+    def record(self, metrics, video_count=0, filtered_count=0, ok=False, cached=False):
+        metrics.record_request(self.body['start_date'], self.body['end_date'], self.request_number, self.latency_seconds,
+                               self.wait_seconds, self.decode_seconds, self.filter_seconds, self.attempt, self.bytes_received,
+                               video_count, filtered_count, ok, cached)
+
+
+# Cursor chain of one window being paged, shared by both engines: whether another page is wanted,
+# and what each fetched page changes (counts, cursor/search_id, the line printed for it)
+class WindowPaging:
+    def __init__(self, crawler, query, start_date, end_date, cursor=0, search_id=None, request_count=0, max_pages=None):
+        self.crawler = crawler
+        self.start_date = start_date
+        self.end_date = end_date
+        self.query_params = build_query_params(query, start_date, end_date)
+        self.cursor = cursor
+        self.search_id = search_id
+        self.request_count = request_count
+        self.max_pages = max_pages
+        self.has_more = True
+        self.window_started = time.perf_counter()
+        self.window_request_count = 0
+        self.window_video_count = 0
+        self.window_filtered_count = 0
+
+    # Whether to request another page; if so it is counted as requested
+    def next_request(self):
+        if not self.has_more or (self.max_pages is not None and self.request_count >= self.max_pages):
+            return False
+        self.request_count += 1
+        self.window_request_count += 1
+        return True
+
+    # Account for a page returned by request_page and move the cursor on. Returns (request_info, filtered_batch),
+    # request_info being (request_number, cursor, has_more, search_id, videos, filtered videos, start_date, end_date).
+    def page_done(self, page):
+        total_videos, filtered_batch, next_cursor, self.has_more, new_search_id = page
+        self.window_video_count += len(total_videos)
+        self.window_filtered_count += len(filtered_batch)
+
+        request_info = (self.request_count, self.cursor, self.has_more, self.search_id, len(total_videos), len(filtered_batch),
+                        self.query_params['start_date'], self.query_params['end_date'])
+        if self.crawler.verbose:
+            print(f"Request {self.request_count} - Total videos returned: {len(total_videos)} / Filtered videos returned: {len(filtered_batch)} / Start date: {self.query_params['start_date']} / End date: {self.query_params['end_date']}")
+
+        self.cursor, self.search_id = advance_cursor(self.cursor, self.search_id, next_cursor, new_search_id, len(total_videos))
+        return request_info, filtered_batch
+
+    # Record a page in a checkpoint store, together with the cursor to continue from
+    def checkpoint_page(self, checkpoint, request_info, filtered_batch):
+        checkpoint.record_page(self.start_date, self.end_date, request_info, filtered_batch, self.cursor, self.search_id, self.has_more)
+
+    def finish(self):
+        self.crawler.metrics.record_window(self.query_params['start_date'], self.query_params['end_date'], self.window_request_count,
+                                           time.perf_counter() - self.window_started, self.window_video_count, self.window_filtered_count)
+
+
+# Where a window starts, or resumes from an earlier run's checkpoint:
+# (cursor, search_id, request_count, videos_count, has_more)
+def resume_window(checkpoint, start_date, end_date):
+    state = checkpoint.window_state(start_date, end_date) if checkpoint is not None else None
+    if state is None:
+        return 0, None, 0, 0, True
+    status, cursor, search_id, request_count, videos_count = state
+    return cursor, search_id, request_count, videos_count, status == IN_PROGRESS
+
+
+# A window's pages as (request_info, filtered_videos): read back from the checkpoint when there is one,
+# so that no window is held in memory while it is fetched or waits its turn to be written, else kept in a list
+def window_pages(checkpoint, start_date, end_date):
+    return CheckpointPages(checkpoint, start_date, end_date) if checkpoint is not None else []
+
+
+# The crawl engine behind every mode: requests, retries, decoding, filtering and paging live here once.
+# Each crawler carries its own token manager, rate limiter and metrics (pass one RateLimiter to several
+# crawlers to share a quota), and nothing is created or fetched until a crawl starts.
+# verbose=False drops the line printed for every request and window split (errors still go to stderr).
+# The steps that do not wait on the network (cached_page, handle_response, network_error_delay, give_up,
+# WindowPaging) are shared with AsyncVideoCrawler, which only replaces the waiting.
+class VideoCrawler:
+    def __init__(self, token_manager, filter_conditions=(), query_fields=VIDEO_FIELDS, base_url=API_BASE_URL,
+                 rate_limiter=None, metrics=None, retries=10, response_cache=None, verbose=True):
+        self.token_manager = token_manager
+        self.video_filter = compile_filter(filter_conditions)
+        self.query_url = f"{base_url}/v2/research/video/query/?fields={','.join(query_fields)}"
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter()
+        self.metrics = metrics if metrics is not None else CrawlMetrics()
+        self.retries = retries
+        self.response_cache = response_cache
+        self.verbose = verbose
+
+    # Decode a response body; an attribute lookup so profiling can wrap it per crawler
+    def decode_response(self, raw_response):
+        return decode_response(raw_response)
+
+    # Filter videos. Kept videos are not copied; the url column is added when they are written out.
+    def filter_videos(self, videos):
+        video_filter = self.video_filter
+        return [video for video in videos if video_filter(video)]
+
+    # Make TikTok API request and process the response with retry mechanism.
+    # Returns (total_videos, filtered_videos, next_cursor, has_more, search_id), or raises PageFetchError.
+    def request_page(self, query_params, cursor, search_id, request_number):
+        page_request = PageRequest(query_params, cursor, search_id, request_number)
+
+        if self.response_cache is not None:
+            page = self.cached_page(page_request)
+            if page is not None:
+                return page
+
+        while page_request.attempt < self.retries:
+            page_request.start_wait()
+            self.rate_limiter.acquire()
+            page_request.start_request()
+            try:
+                response = self.token_manager.post(
+                    self.query_url,
+                    headers={'Content-Type': 'application/json'},
+                    data=json.dumps(page_request.body)
+                )
+            except RETRYABLE_EXCEPTIONS as e:
+                page_request.end_request()
+                delay = self.network_error_delay(page_request, e)
+            else:
+                page_request.end_request()
+                page, delay = self.handle_response(page_request, response)
+                if page is not None:
+                    return page
+            if delay is None:
+                break
+            time.sleep(delay)
+
+        return self.give_up(page_request)
+
+    # Serve a page from the response cache when it holds it, as request_page would return it. In replay-only
+    # mode a miss raises PageFetchError; otherwise a miss returns None and the page is fetched.
+    def cached_page(self, page_request):
+        body = page_request.body
+        raw_response = self.response_cache.get(self.query_url, body)
+        if raw_response is None:
+            if not self.response_cache.replay_only:
+                return None
+            page_request.record(self.metrics)
+            raise PageFetchError(f"Replay cache miss: {body['start_date']}-{body['end_date']} cursor {body['cursor']}",
+                                 (body['start_date'], body['end_date']))
+
+        decode_started = time.perf_counter()
+        response_data = self.decode_response(raw_response)
+        page_request.decode_seconds += time.perf_counter() - decode_started
+        return self._page(page_request, response_data, cached=True)
+
+    # Filter the videos of a decoded page and record its metrics. A cached page's search_id is dropped: it names
+    # a paging session of the API that has likely expired, and the next page, if not cached, would be refused with it.
+    def _page(self, page_request, response_data, cached=False):
+        total_videos = response_data['data']['videos']
+        filter_started = time.perf_counter()
+        filtered_videos = self.filter_videos(total_videos)
+        page_request.filter_seconds += time.perf_counter() - filter_started
+        page_request.record(self.metrics, len(total_videos), len(filtered_videos), ok=True, cached=cached)
+        return total_videos, filtered_videos, response_data['data'].get('cursor'), \
+               response_data['data'].get('has_more'), None if cached else response_data['data'].get('search_id')
+
+    # Process a response (anything with status_code, headers and content): decode it, cache and filter a page
+    # of videos, and otherwise classify the failure. Returns (page, None) once the page is settled, or
+    # (None, delay) with the seconds to back off before retrying, delay being None when retrying is pointless.
+    def handle_response(self, page_request, response):
+        raw_response = response.content
+        page_request.bytes_received += len(raw_response)
+
+        response_data = None
+        try:
+            decode_started = time.perf_counter()
+            response_data = self.decode_response(raw_response)
+            page_request.decode_seconds += time.perf_counter() - decode_started
+            if 'data' in response_data and 'videos' in response_data['data']:
+                if self.response_cache is not None:
+                    self.response_cache.put(self.query_url, page_request.body, raw_response)
+                return self._page(page_request, response_data), None
+            print(f"API Error: {response_data.get('error', 'Unexpected response')}", file=sys.stderr)
+            code, message = error_details(response_data)
+            if code == 'invalid_params':
+                # An expired search_id (from the cache's or an earlier run's paging session, e.g. resumed from a
+                # checkpoint): ask for the same cursor once more without it
+                if 'search_id' in message and page_request.drop_search_id():
+                    return None, 0.0
+                # A cursor past the end of the window ends it
+                if 'Invalid count or cursor' in message:
+                    page_request.record(self.metrics)
+                    return ([], [], None, False, None), None
+        except json.JSONDecodeError as e:
+            print(f"JSON decode error: {e}", file=sys.stderr)
+            print(f"Raw response: {raw_response.decode(errors='replace')}", file=sys.stderr)
+
+        # Back off according to the kind of failure instead of a fixed sleep
+        error_class = classify_response(response, response_data)
+        if error_class == FATAL:
+            return None, None
+        page_request.attempt += 1
+        if error_class == RATE_LIMITED:
+            # Pause every worker, honoring Retry-After when the API sends it
+            delay = retry_after_seconds(response)
+            self.rate_limiter.pause(delay if delay is not None else backoff_delay(page_request.attempt))
+            return None, 0.0
+        return None, self._backoff(page_request)
+
+    # Seconds to back off after a request that failed without a response
+    def network_error_delay(self, page_request, error):
+        print(f"Request error: {error}", file=sys.stderr)
+        page_request.attempt += 1
+        return self._backoff(page_request)
+
+    def _backoff(self, page_request):
+        delay = backoff_delay(page_request.attempt)
+        page_request.wait_seconds += delay
+        return delay
+
+    # Fail a page whose retries ran out or whose failure is fatal
+    def give_up(self, page_request):
+        page_request.record(self.metrics)
+        body = page_request.body
+        outcome = f"failed {page_request.attempt} times" if page_request.attempt >= self.retries else "was refused by the API"
+        raise PageFetchError(f"Request {page_request.request_number} of {body['start_date']}-{body['end_date']} (cursor {body['cursor']}) "
+                             f"{outcome}", (body['start_date'], body['end_date']))
+
+    # Lazily page through one date window, yielding (request_info, filtered_batch) for each page, where
+    # request_info is (request_number, cursor, has_more, search_id, videos, filtered videos, start_date, end_date).
+    # The next page is only requested when the consumer asks for it, so closing the generator stops the window.
+    # Paging starts from the given cursor/search_id and stops after max_pages requests in all or once stop_event
+    # is set. With a checkpoint store, every page is recorded together with the cursor to continue from.
+    # A page that cannot be fetched raises PageFetchError, leaving the checkpoint at the last good page.
+    def iter_window_pages(self, query, start_date, end_date, cursor=0, search_id=None, request_count=0,
+                          max_pages=None, checkpoint=None, stop_event=None):
+        paging = WindowPaging(self, query, start_date, end_date, cursor, search_id, request_count, max_pages)
+        try:
+            while not (stop_event is not None and stop_event.is_set()) and paging.next_request():
+                page = self.request_page(paging.query_params, paging.cursor, paging.search_id, paging.request_count)
+                request_info, filtered_batch = paging.page_done(page)
+                if checkpoint is not None:
+                    paging.checkpoint_page(checkpoint, request_info, filtered_batch)
+                yield request_info, filtered_batch
+        finally:
+            paging.finish()
+
+    # Retrieve one date window. When max_pages is set, paging stops early and has_more tells the caller whether
+    # the window was drained. With a checkpoint store, a previously started window continues from its last
+    # recorded cursor/search_id instead of starting over.
+    # Returns (pages, request_count, videos_count, has_more, error), pages being the window's (request_info,
+    # filtered_videos) pairs (see window_pages) and error the PageFetchError that stopped the window early, or None.
+    def retrieve_window(self, query, start_date, end_date, max_pages=None, checkpoint=None, stop_event=None):
+        cursor, search_id, request_count, videos_count, has_more = resume_window(checkpoint, start_date, end_date)
+        pages = window_pages(checkpoint, start_date, end_date)
+        error = None
+        if has_more:
+            try:
+                for request_info, filtered_batch in self.iter_window_pages(query, start_date, end_date, cursor, search_id,
+                                                                           request_count, max_pages, checkpoint, stop_event):
+                    if checkpoint is None:
+                        pages.append((request_info, filtered_batch))
+                    request_count = request_info[0]
+                    videos_count += request_info[4]
+                    has_more = request_info[2]
+            except PageFetchError as e:
+                print(f"Window {start_date.strftime('%Y%m%d')}-{end_date.strftime('%Y%m%d')} failed: {e}", file=sys.stderr)
+                error = e
+
+        return pages, request_count, videos_count, has_more, error
+
+    # Probe a window with up to probe_pages requests. If it is still not drained, the window is dense:
+    # the probed pages are dropped (the API gives no ordering to resume from in a sub-window) and the
+    # window is returned as its days, drained concurrently. At most probe_pages requests are spent twice per window,
+    # plus a short last page per day, so splitting pays off when long cursor chains, not the quota, limit a crawl.
+    # Returns (result, sub_windows), result being (pages, request_count, videos_count, status) with status DONE,
+    # SPLIT (the pages are the discarded probe pages, without their videos) or IN_PROGRESS (a page failed, or the
+    # crawl was stopped; the checkpoint keeps the window's last good cursor).
+    def retrieve_window_or_split(self, query, start_date, end_date, probe_pages=None, checkpoint=None, stop_event=None):
+        # A window already split by an earlier run goes straight to its sub-windows
+        if checkpoint is not None and checkpoint.window_status(start_date, end_date) == SPLIT:
+            return ([], 0, 0, SPLIT), split_date_window(start_date, end_date)
+
+        window = self.retrieve_window(query, start_date, end_date, probe_max_pages(start_date, end_date, probe_pages), checkpoint, stop_event)
+        return self.probe_result(start_date, end_date, window, checkpoint, stopped=stop_event is not None and stop_event.is_set())
+
+    # (result, sub_windows) of a probed window, given what retrieve_window returned for it
+    def probe_result(self, start_date, end_date, window, checkpoint=None, stopped=False):
+        pages, request_count, videos_count, has_more, error = window
+        if stopped or error is not None:
+            # Abandoned or failed, not dense: leave the window in progress rather than splitting it
+            return (pages, request_count, videos_count, IN_PROGRESS), []
+        if has_more:
+            if self.verbose:
+                print(f"Splitting dense window {start_date.strftime('%Y%m%d')}-{end_date.strftime('%Y%m%d')} after {request_count} requests")
+            # Only the probe pages' request_info is kept, read before mark_split drops the pages from the checkpoint
+            probe_pages = [(request_info, []) for request_info, _ in pages]
+            if checkpoint is not None:
+                checkpoint.mark_split(start_date, end_date)
+            return (probe_pages, request_count, videos_count, SPLIT), split_date_window(start_date, end_date)
+        return (pages, request_count, videos_count, DONE), []
+
+    # Drain every date window at the same time, each with its own cursor/search_id chain (see retrieve_batch_concurrently).
+    # (window, result) pairs are yielded in date order as soon as every earlier window has finished, so they can be
+    # streamed to the output while later windows are still running.
+    def retrieve_windows_concurrently(self, query, windows, max_workers=4, probe_pages=None, checkpoint=None, progress=None):
+        for _, window, result in retrieve_batch_concurrently([(self, query, windows, checkpoint)], max_workers, probe_pages, progress):
+            yield window, result
+
+    # Lazily yield (window, video) for every filtered video from start_date to final_end_date, window by window.
+    # Nothing is fetched ahead of the consumer: stopping the iteration (islice, break plus close()) stops the
+    # crawl where it is, mid-window and mid-page, without requesting another page.
+    # Each page's request_info is recorded to request_log (a RequestLog) as it arrives.
+    def iter_filtered_videos(self, query, start_date, final_end_date, request_log=None):
+        for window_start, window_end in plan_date_windows(start_date, final_end_date):
+            window = (window_start.strftime("%Y%m%d"), window_end.strftime("%Y%m%d"))
+            with contextlib.closing(self.iter_window_pages(query, window_start, window_end)) as pages:
+                for request_info, filtered_batch in pages:
+                    if request_log is not None:
+                        request_log.record(request_info)
+                    for video in filtered_batch:
+                        yield window, video
+
+
+# Bookkeeping shared by the batch schedulers: the date windows of several jobs, each a (crawler, query,
+# windows, checkpoint) tuple, handed out round-robin across jobs so that a job with many or dense windows
+# cannot starve the others, and finished windows handed back in each job's date order.
+class WindowSchedule:
+    def __init__(self, jobs):
+        self.jobs = jobs
+        self.queued = [collections.deque(sorted(windows)) for _, _, windows, _ in jobs]
+        self.unfinished = [set(windows) for _, _, windows, _ in jobs]  # Queued or running windows of each job
+        self.results = [{} for _ in jobs]
+        self.next_job = 0
+
+    # (job_index, window) of the next job (in turn) that has a window waiting, or None
+    def next_window(self):
+        for offset in range(len(self.jobs)):
+            job_index = (self.next_job + offset) % len(self.jobs)
+            if self.queued[job_index]:
+                self.next_job = job_index + 1
+                return job_index, self.queued[job_index].popleft()
+        return None
+
+    # Record a finished window. Split sub-windows go to the front of their job's queue.
+    # Returns every (job_index, window, result) of this job that no unfinished window precedes.
+    def finish(self, job_index, window, result, sub_windows):
+        self.results[job_index][window] = result
+        self.unfinished[job_index].discard(window)
+        self.unfinished[job_index].update(sub_windows)
+        self.queued[job_index].extendleft(reversed(sub_windows))
+
+        ready = []
+        earliest_unfinished = min(self.unfinished[job_index]) if self.unfinished[job_index] else None
+        for finished_window in sorted(self.results[job_index]):
+            if earliest_unfinished is not None and finished_window > earliest_unfinished:
+                break
+            ready.append((job_index, finished_window, self.results[job_index].pop(finished_window)))
+        return ready
+
+
+# Crawl the date windows of several jobs, each a (crawler, query, windows, checkpoint) tuple, through one
+# shared executor with at most max_workers windows in flight, scheduled by WindowSchedule. Windows still
+# paging after probe_pages requests are split into smaller windows, fetched next.
+# Yields (job_index, window, result) with each job's windows in date order, as soon as every earlier window
+# of that job has finished. Closing the generator early (or an error) cancels windows not yet started and
+# stops running ones after their in-flight request, instead of draining every window first.
+# A CrawlProgress given as progress is told about every window as it finishes or is split.
+def retrieve_batch_concurrently(jobs, max_workers=4, probe_pages=None, progress=None):
+    schedule = WindowSchedule(jobs)
+    running = {}
+    stop_event = threading.Event()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Start the next window, if any is waiting
+        def submit_next():
+            job = schedule.next_window()
+            if job is None:
+                return False
+            job_index, (start_date, end_date) = job
+            crawler, query, _, checkpoint = jobs[job_index]
+            future = executor.submit(crawler.retrieve_window_or_split, query, start_date, end_date, probe_pages, checkpoint, stop_event)
+            running[future] = job
+            return True
+
+        try:
+            while len(running) < max_workers and submit_next():
+                pass
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job_index, window = running.pop(future)
+                    result, sub_windows = future.result()
+                    if progress is not None:
+                        progress.window_done(len(sub_windows))
+                    yield from schedule.finish(job_index, window, result, sub_windows)
+
+                while len(running) < max_workers and submit_next():
+                    pass
+        finally:
+            stop_event.set()
+            executor.shutdown(cancel_futures=True)
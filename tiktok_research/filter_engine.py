@@ -0,0 +1,66 @@
+import operator
+import re
+
+# Compiles declarative filter conditions into a single predicate, once, before the crawl starts.
+#
+# Conditions use the same shape as the API's query conditions:
+#     {"operation": "GTE", "field_name": "view_count", "field_values": [5000]}
+# Supported operations:
+#     EQ, IN          value is one of field_values (for list fields such as hashtag_names: any overlap)
+#     GT, GTE, LT, LTE numeric threshold against field_values[0]
+#     NOT_EMPTY       field is present and non-empty (no field_values)
+#     MATCHES         regular expression field_values[0] found in the (string) field
+
+COMPARISONS = {'GT': operator.gt, 'GTE': operator.ge, 'LT': operator.lt, 'LTE': operator.le}
+
+
+# Build the predicate for one condition
+def compile_condition(condition):
+    field_name = condition['field_name']
+    operation = condition['operation']
+    field_values = condition.get('field_values', [])
+
+    if operation == 'NOT_EMPTY':
+        return lambda video: bool(video.get(field_name))
+
+    if operation in ('EQ', 'IN'):
+        allowed = frozenset(field_values)
+
+        def is_member(video):
+            value = video.get(field_name)
+            if isinstance(value, list):
+                return not allowed.isdisjoint(value)
+            return value is not None and value in allowed
+        return is_member
+
+    if operation in COMPARISONS:
+        compare = COMPARISONS[operation]
+        threshold = field_values[0]
+
+        def passes_threshold(video):
+            value = video.get(field_name)
+            return value is not None and compare(value, threshold)
+        return passes_threshold
+
+    if operation == 'MATCHES':
+        search = re.compile(field_values[0]).search
+
+        def matches(video):
+            value = video.get(field_name)
+            return value is not None and search(value) is not None
+        return matches
+
+    raise ValueError(f"Unknown filter operation: {operation}")
+
+
+# Build one predicate that passes a video only if every condition does
+def compile_filter(conditions):
+    predicates = [compile_condition(condition) for condition in conditions]
+    if not predicates:
+        return lambda video: True
+    if len(predicates) == 1:
+        return predicates[0]
+    if len(predicates) == 2:
+        first, second = predicates
+        return lambda video: first(video) and second(video)
+    return lambda video: all(predicate(video) for predicate in predicates)
@@ -0,0 +1,37 @@
+import json
+from .video_record import VideoRecord
+
+try:
+    import orjson
+except ImportError:  # Falls back to the standard library decoder
+    orjson = None
+
+# Video fields that hold 64-bit ids. Python ints keep their full precision when decoded,
+# so these only need converting if the API sends them as strings.
+INT64_ID_FIELDS = ('id', 'music_id', 'playlist_id')
+
+
+# Parse an API response body (str or bytes) in one pass, keeping int64 ids exact.
+# Only the known id fields are converted, so numeric-looking text such as a
+# video_description of "2024" stays a string. Videos come back as compact VideoRecords
+# unless records is False, in which case they are left as the decoded dicts.
+def decode_response(raw_response, records=True):
+    # orjson decodes integers up to 64 bits exactly, which covers every id field.
+    # Its JSONDecodeError subclasses json.JSONDecodeError, so callers handle both the same way.
+    if orjson is not None:
+        response_data = orjson.loads(raw_response)
+    else:
+        response_data = json.loads(raw_response)
+
+    data = response_data.get('data') if isinstance(response_data, dict) else None
+    videos = data.get('videos') if isinstance(data, dict) else None
+    if not videos:
+        return response_data
+    for video in videos:
+        for field in INT64_ID_FIELDS:
+            value = video.get(field)
+            if isinstance(value, str) and value.isdigit():
+                video[field] = int(value)
+    if records:
+        data['videos'] = [VideoRecord(video) for video in videos]
+    return response_data
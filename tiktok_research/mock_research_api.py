@@ -0,0 +1,204 @@
+import argparse
+import datetime
+import hashlib
+import json
+import random
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-in for the research API, for profiling and regression runs without spending quota.
+# It serves /v2/oauth/token/ and /v2/research/video/query/ with cursor/search_id paging over a
+# deterministic synthetic dataset of videos_per_day videos for every day in the requested window.
+# Query conditions are accepted but not applied; only start_date/end_date select videos.
+#
+# Point the crawlers at it with TIKTOK_API_BASE_URL=http://127.0.0.1:<port>
+
+MOCK_ACCESS_TOKEN = 'mock-access-token'
+
+VIDEO_FIELDS = [
+    "id", "view_count", "username", "hashtag_names", "video_description", "create_time", "region_code",
+    "share_count", "like_count", "comment_count", "music_id", "effect_ids", "playlist_id", "voice_to_text",
+    "is_stem_verified", "favorites_count", "video_duration"
+]
+
+
+# Deterministic pseudo-random integer for a video, so repeated runs see identical data
+def _video_number(day_ordinal, index, salt):
+    digest = hashlib.blake2b(f'{day_ordinal}:{index}:{salt}'.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+# Build the index-th synthetic video created on the given day
+def make_video(day, index):
+    day_ordinal = day.toordinal()
+    views = _video_number(day_ordinal, index, 'views') % 20000
+    hashtag_count = _video_number(day_ordinal, index, 'hashtags') % 4
+    return {
+        "id": 7000000000000000000 + day_ordinal * 100000 + index,
+        "view_count": views,
+        "username": f"user{_video_number(day_ordinal, index, 'user') % 5000}",
+        "hashtag_names": [f"tag{_video_number(day_ordinal, index, n) % 300}" for n in range(hashtag_count)],
+        "video_description": f"Synthetic video {index} posted on {day.isoformat()} " + "lorem ipsum " * (index % 8),
+        "create_time": int(datetime.datetime(day.year, day.month, day.day, tzinfo=datetime.timezone.utc).timestamp()) + index % 86400,
+        "region_code": "US",
+        "share_count": views // 50,
+        "like_count": views // 8,
+        "comment_count": views // 40,
+        "music_id": 7100000000000000000 + _video_number(day_ordinal, index, 'music') % 10 ** 12,
+        "effect_ids": ["0"],
+        "playlist_id": 0,
+        "voice_to_text": "spoken words " * (index % 5),
+        "is_stem_verified": index % 7 == 0,
+        "favorites_count": views // 30,
+        "video_duration": 30 + index % 60,
+    }
+
+
+# Request handler; server-wide behaviour lives on self.server.options
+class MockResearchApiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like the real API
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; without this, Nagle's algorithm plus delayed ACKs
+        # add ~40ms to every response and swamp the latency being simulated
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status, code, message, headers=None):
+        self._send_json(status, {"data": {}, "error": {"code": code, "message": message, "log_id": "mock"}}, headers)
+
+    def do_POST(self):
+        options = self.server.options
+        raw_body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        path, _, query_string = self.path.partition('?')
+
+        if path.rstrip('/') == '/v2/oauth/token':
+            self._send_json(200, {"access_token": MOCK_ACCESS_TOKEN, "expires_in": options['token_expires_in'], "token_type": "Bearer"})
+            return
+        if path.rstrip('/') != '/v2/research/video/query':
+            self._send_error(404, 'not_found', f'Unknown path {path}')
+            return
+
+        if options['latency']:
+            time.sleep(options['latency'])
+        self.server.count_request()
+
+        if self.headers.get('Authorization') != f'Bearer {MOCK_ACCESS_TOKEN}':
+            self._send_error(401, 'access_token_invalid', 'The access token is invalid or not found in the request.')
+            return
+        if self.server.random.random() < options['rate_limit_rate']:
+            self._send_error(429, 'rate_limit_exceeded', 'API rate limit was exceeded.', {'Retry-After': str(options['retry_after'])})
+            return
+        if self.server.random.random() < options['invalid_params_rate']:
+            self._send_error(400, 'invalid_params', 'Invalid search_id')
+            return
+
+        try:
+            body = json.loads(raw_body)
+            start_date = datetime.datetime.strptime(body['start_date'], '%Y%m%d').date()
+            end_date = datetime.datetime.strptime(body['end_date'], '%Y%m%d').date()
+            cursor = int(body.get('cursor', 0))
+            max_count = int(body.get('max_count', 20))
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_error(400, 'invalid_params', f'Invalid request body: {e}')
+            return
+        if (end_date - start_date).days >= 30 or end_date < start_date:
+            self._send_error(400, 'invalid_params', 'The date range must be at most 30 days.')
+            return
+
+        search_key = json.dumps([body.get('query'), body['start_date'], body['end_date']], sort_keys=True)
+        search_id = hashlib.blake2b(search_key.encode(), digest_size=8).hexdigest()
+        if body.get('search_id') and body['search_id'] != search_id:
+            self._send_error(400, 'invalid_params', 'Invalid search_id')
+            return
+
+        videos_per_day = options['videos_per_day']
+        total = videos_per_day * ((end_date - start_date).days + 1)
+        if cursor < 0 or cursor > total or max_count > 100:
+            self._send_error(400, 'invalid_params', 'Invalid count or cursor')
+            return
+
+        fields = dict(pair.split('=', 1) for pair in query_string.split('&') if '=' in pair).get('fields')
+        fields = fields.split(',') if fields else VIDEO_FIELDS
+        videos = []
+        for position in range(cursor, min(cursor + max_count, total)):
+            day = start_date + datetime.timedelta(days=position // videos_per_day)
+            video = make_video(day, position % videos_per_day)
+            videos.append({field: video[field] for field in fields if field in video})
+
+        next_cursor = cursor + len(videos)
+        self._send_json(200, {
+            "data": {"videos": videos, "cursor": next_cursor, "has_more": next_cursor < total, "search_id": search_id},
+            "error": {"code": "ok", "message": "", "log_id": "mock"}
+        })
+
+
+class MockResearchApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, options):
+        super().__init__(address, MockResearchApiHandler)
+        self.options = options
+        self.random = random.Random(options['seed'])
+        self.request_count = 0
+        self._count_lock = threading.Lock()
+
+    def count_request(self):
+        with self._count_lock:
+            self.request_count += 1
+
+
+# Start the mock server on a background thread and return (server, base_url). Use port=0 for a free port.
+def start_mock_server(host='127.0.0.1', port=0, videos_per_day=150, latency=0.0, rate_limit_rate=0.0,
+                      retry_after=1, invalid_params_rate=0.0, token_expires_in=7200, seed=0):
+    options = {
+        'videos_per_day': videos_per_day,
+        'latency': latency,
+        'rate_limit_rate': rate_limit_rate,
+        'retry_after': retry_after,
+        'invalid_params_rate': invalid_params_rate,
+        'token_expires_in': token_expires_in,
+        'seed': seed,
+    }
+    server = MockResearchApiServer((host, port), options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://{host}:{server.server_address[1]}'
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run a local mock of the TikTok research API.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--videos-per-day', type=int, default=150, help='Synthetic videos created on each day')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every query request')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='Fraction of query requests answered with 429')
+    parser.add_argument('--retry-after', type=float, default=1, help='Retry-After seconds sent with 429 responses')
+    parser.add_argument('--invalid-params-rate', type=float, default=0.0, help='Fraction of query requests answered with invalid_params')
+    parser.add_argument('--token-expires-in', type=int, default=7200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    server, base_url = start_mock_server(
+        args.host, args.port, args.videos_per_day, args.latency, args.rate_limit_rate,
+        args.retry_after, args.invalid_params_rate, args.token_expires_in, args.seed
+    )
+    print(f'Mock research API listening on {base_url}')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
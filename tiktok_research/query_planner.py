@@ -0,0 +1,72 @@
+# Query planning: move as much of the video filter as possible into the research API query.
+#
+# Filters are written as conditions in the same shape as the API's query conditions:
+#     {"operation": "GTE", "field_name": "view_count", "field_values": [5000]}
+# (see filter_engine for the operations that can be checked client-side).
+#
+# The API can only filter on a few fields, and only with EQ/IN. Those conditions are pushed into
+# the query's "and" clause so non-matching videos never cross the wire; everything else
+# (e.g. view_count thresholds or "has any hashtag") stays a client-side check.
+
+# Every field the video query endpoint can return
+VIDEO_FIELDS = [
+    "id", "view_count", "username", "hashtag_names", "video_description", "create_time", "region_code",
+    "share_count", "like_count", "comment_count", "music_id", "effect_ids", "playlist_id", "voice_to_text",
+    "is_stem_verified", "favorites_count", "video_duration"
+]
+
+# Output columns built from other fields rather than requested from the API
+DERIVED_COLUMNS = {'url': ('username', 'id')}
+
+# Video fields that map to a research API query field
+PUSHDOWN_FIELDS = {
+    'id': 'video_id',
+    'username': 'username',
+    'region_code': 'region_code',
+    'hashtag_names': 'hashtag_name',
+    'music_id': 'music_id',
+    'effect_ids': 'effect_id',
+}
+PUSHDOWN_OPERATIONS = ('EQ', 'IN')
+
+
+# Split filter conditions into a query with the pushable ones added and the residual client-side conditions
+def plan_query(query, filter_conditions):
+    pushed_conditions = []
+    client_conditions = []
+    for condition in filter_conditions:
+        api_field = PUSHDOWN_FIELDS.get(condition['field_name'])
+        if api_field and condition['operation'] in PUSHDOWN_OPERATIONS:
+            pushed_conditions.append({
+                "operation": condition['operation'],
+                "field_name": api_field,
+                "field_values": [str(value) for value in condition['field_values']]
+            })
+        else:
+            client_conditions.append(condition)
+
+    planned_query = {**query, "and": list(query.get("and", [])) + pushed_conditions} if pushed_conditions else query
+    return planned_query, client_conditions
+
+
+# Fields to request: those behind the output columns, those the client-side filter reads,
+# and any the crawler itself needs (id for de-duplication by default). Large free-text fields
+# such as voice_to_text are only downloaded when something actually uses them.
+def plan_fields(column_order, client_conditions, required=('id',)):
+    needed = set(required)
+    for column in column_order:
+        needed.update(DERIVED_COLUMNS.get(column, (column,)))
+    needed.update(condition['field_name'] for condition in client_conditions)
+    unknown = needed - set(VIDEO_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown video fields: {sorted(unknown)}")
+    return [field for field in VIDEO_FIELDS if field in needed]
+
+
+# Describe a plan for the run summary
+def describe_plan(filter_conditions, client_conditions):
+    def describe(condition):
+        return f"{condition['field_name']} {condition['operation']} {condition.get('field_values', '')}".rstrip()
+    pushed = [describe(condition) for condition in filter_conditions if condition not in client_conditions]
+    client = [describe(condition) for condition in client_conditions]
+    return f"Pushed to API query: {pushed or 'none'} / Filtered client-side: {client or 'none'}"
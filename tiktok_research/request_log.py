@@ -0,0 +1,47 @@
+import logging
+import logging.handlers
+import threading
+
+
+# Running totals of a crawl plus a per-request log streamed to a size-rotated file, so accounting takes
+# the same memory whether a crawl makes ten requests or a million. Totals are also kept per date window
+# for the selectivity summary (one entry per window, not per request).
+class RequestLog:
+    def __init__(self, path=None, max_bytes=10 * 1024 * 1024, backup_count=3):
+        self.path = path
+        self.request_count = 0
+        self.video_count = 0
+        self.filtered_video_count = 0
+        self.discarded_request_count = 0  # Probe requests of windows that were split, whose pages were dropped
+        self.window_totals = {}  # (start_date, end_date) -> [filtered videos, videos]
+        self._lock = threading.Lock()
+        self._handler = None
+        if path is not None:
+            self._handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+
+    # Count one request, given as a request_info tuple
+    # (request_number, cursor, has_more, search_id, videos, filtered videos, start_date, end_date).
+    # A discarded request (a probe page of a window that was split) only counts as a request made.
+    def record(self, request_info, discarded=False):
+        req_num, cursor, has_more, search_id, total_video_count, filtered_video_count, start_date_str, end_date_str = request_info
+        with self._lock:
+            self.request_count += 1
+            if discarded:
+                self.discarded_request_count += 1
+            else:
+                self.video_count += total_video_count
+                self.filtered_video_count += filtered_video_count
+                window_totals = self.window_totals.setdefault((start_date_str, end_date_str), [0, 0])
+                window_totals[0] += filtered_video_count
+                window_totals[1] += total_video_count
+            if self._handler is not None:
+                self._handler.handle(logging.makeLogRecord({
+                    'msg': f'Request {req_num}: cursor={cursor}, has_more={has_more}, search_id={search_id}, total_videos_returned={total_video_count}, filtered_videos_returned={filtered_video_count}, Start date: {start_date_str}, End date: {end_date_str}'
+                           + (' (discarded probe, window split)' if discarded else '')
+                }))
+
+    def close(self):
+        with self._lock:
+            if self._handler is not None:
+                self._handler.close()
+                self._handler = None
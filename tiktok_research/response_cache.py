@@ -0,0 +1,132 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+
+# Query clauses are sets of conditions, so their order (and the order of field_values) does not change
+# the result; sort them so equivalent queries share cache entries
+def _normalize_query(query):
+    if isinstance(query, dict):
+        normalized = {}
+        for key, value in query.items():
+            if key in ('and', 'or', 'not') and isinstance(value, list):
+                value = sorted((_normalize_query(condition) for condition in value), key=lambda condition: json.dumps(condition, sort_keys=True))
+            elif key == 'field_values' and isinstance(value, list):
+                value = sorted(value, key=str)
+            normalized[key] = value
+        return normalized
+    return query
+
+
+# Split a query URL into the endpoint (with any other parameters) and the set of fields it asks for
+def split_fields(url):
+    parts = urlsplit(url)
+    params = parse_qsl(parts.query)
+    fields = frozenset(field for key, value in params if key == 'fields' for field in value.split(',') if field)
+    endpoint = urlunsplit(parts._replace(query=urlencode(sorted((key, value) for key, value in params if key != 'fields'))))
+    return endpoint, fields
+
+
+# Cache key for a request: the endpoint, the normalized query body, date window and cursor. search_id only
+# identifies the API's paging session, so it is left out and a cached crawl can be replayed page by page
+# without the original session. The requested fields are not part of the key either: they are stored with
+# the entry, and a response holding every field asked for serves the request.
+def cache_key(url, body):
+    normalized_body = {key: value for key, value in body.items() if key != 'search_id'}
+    normalized_body['query'] = _normalize_query(normalized_body.get('query'))
+    normalized_body['cursor'] = int(normalized_body.get('cursor', 0))
+    key_text = json.dumps([split_fields(url)[0], normalized_body], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(key_text.encode()).hexdigest()
+
+
+# On-disk cache of raw query responses, kept in SQLite next to the output so repeated crawls of the same
+# range do not spend quota on identical pages. Bodies are stored zlib-compressed. Entries older than ttl
+# seconds are ignored and dropped, and once the stored bodies exceed max_bytes the least recently used
+# are evicted. With replay_only, the crawler never goes to the network and a miss fails the window.
+# A page cached with more fields than a later crawl needs (e.g. fewer --columns) is a hit; one missing a
+# needed field is a miss, and the response then fetched replaces it.
+class ResponseCache:
+    def __init__(self, path, ttl=None, max_bytes=None, replay_only=False):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.replay_only = replay_only
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL,
+                body BLOB NOT NULL,
+                fields TEXT NOT NULL DEFAULT ''
+            );
+            CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+        ''')
+        # Caches written before fields were stored: their entries are keyed by the full URL and are never read
+        # again, so they only wait to be evicted
+        if 'fields' not in [column[1] for column in self._conn.execute('PRAGMA table_info(responses)')]:
+            self._conn.execute("ALTER TABLE responses ADD COLUMN fields TEXT NOT NULL DEFAULT ''")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    # Return the cached raw response for a request, or None. A cached response only serves the request
+    # when it was fetched with every field the request's URL asks for.
+    def get(self, url, body):
+        key = cache_key(url, body)
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute('SELECT created_at, size, body, fields FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is not None and self.ttl is not None and now - row[0] > self.ttl:
+                self._conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self._total_bytes -= row[1]
+                row = None
+            if row is None or not split_fields(url)[1] <= set(row[3].split(',')):
+                self.misses += 1
+                return None
+            self._conn.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (now, key))
+            self.hits += 1
+        return zlib.decompress(row[2])
+
+    # Store the raw response for a request with the fields it was fetched with, evicting least recently used
+    # entries beyond max_bytes
+    def put(self, url, body, raw_response):
+        key = cache_key(url, body)
+        fields = ','.join(sorted(split_fields(url)[1]))
+        compressed = zlib.compress(raw_response, 1)
+        now = time.time()
+        with self._lock, self._conn:
+            previous = self._conn.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            if previous is not None:
+                self._total_bytes -= previous[0]
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses (key, created_at, accessed_at, size, body, fields) VALUES (?, ?, ?, ?, ?, ?)',
+                (key, now, now, len(compressed), compressed, fields)
+            )
+            self._total_bytes += len(compressed)
+            if self.max_bytes is not None and self._total_bytes > self.max_bytes:
+                self._evict()
+
+    # Drop least recently used entries until the cache fits in max_bytes. Call with the lock held.
+    def _evict(self):
+        rows = self._conn.execute('SELECT key, size FROM responses ORDER BY accessed_at').fetchall()
+        evicted = []
+        for key, size in rows:
+            if self._total_bytes <= self.max_bytes:
+                break
+            evicted.append((key,))
+            self._total_bytes -= size
+        self._conn.executemany('DELETE FROM responses WHERE key = ?', evicted)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,124 @@
+import asyncio
+import datetime
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+import requests
+
+# Research API daily request quota (each request returns up to 100 videos)
+DAILY_REQUEST_QUOTA = 1000
+
+# Error classes for a failed request
+RETRYABLE = 'retryable'
+RATE_LIMITED = 'rate_limited'
+FATAL = 'fatal'
+
+
+
+# A transient failure around a request rather than of it, such as a token refresh answered with a 502 page.
+# Retried like a network failure.
+class TransientError(Exception):
+    pass
+
+
+# Network failures that are worth retrying, including a connection that breaks while the body is read
+RETRYABLE_EXCEPTIONS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.ChunkedEncodingError,
+                        requests.exceptions.ContentDecodingError, TransientError)
+
+
+# Pull the error code out of an API error body ({"error": {"code": ...}} or a flat {"code": ...})
+def _error_code(response_data):
+    if not isinstance(response_data, dict):
+        return None
+    error = response_data.get('error')
+    if isinstance(error, dict) and error.get('code'):
+        return error['code']
+    return response_data.get('code')
+
+
+# (code, message) of an API error body, in either layout; missing parts are None and ''
+def error_details(response_data):
+    if not isinstance(response_data, dict):
+        return None, ''
+    error = response_data.get('error')
+    message = error.get('message') if isinstance(error, dict) else None
+    return _error_code(response_data), message or response_data.get('message') or ''
+
+
+# Sort a failed response into retryable, rate-limited or fatal.
+# response_data is the decoded body, or None if it could not be decoded.
+def classify_response(response, response_data=None):
+    status = response.status_code
+    if status == 429 or _error_code(response_data) == 'rate_limit_exceeded':
+        return RATE_LIMITED
+    if status >= 500 or status == 408:
+        return RETRYABLE
+    if status >= 400:
+        return FATAL
+    return RETRYABLE
+
+
+# Exponential backoff with full jitter: a random delay in [0, min(cap, base * 2 ** attempt)]
+def backoff_delay(attempt, base=1.0, cap=60.0):
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+# Seconds to wait according to the Retry-After header (delta-seconds or HTTP date), or None
+def retry_after_seconds(response):
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+
+# Client-side token bucket shared by every worker. It refills at the daily quota rate, and a
+# rate-limit response pauses all workers together instead of each one retrying on its own.
+class RateLimiter:
+    def __init__(self, daily_quota=DAILY_REQUEST_QUOTA, burst=None):
+        self.capacity = burst if burst is not None else daily_quota
+        self.rate = daily_quota / 86400.0 if daily_quota else None  # Tokens per second, None for unlimited
+        self._tokens = float(self.capacity or 0)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    # Take a token if a request may be sent now (returns None), or return the seconds to wait before trying again
+    def _try_acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            wait = self._paused_until - now
+            if wait <= 0:
+                if self.rate is None:
+                    return None
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return None
+                wait = (1 - self._tokens) / self.rate
+            return wait
+
+    # Block until a request may be sent
+    def acquire(self):
+        while (wait := self._try_acquire()) is not None:
+            time.sleep(wait)
+
+    # Async variant that waits on the event loop instead of blocking its thread
+    async def acquire_async(self):
+        while (wait := self._try_acquire()) is not None:
+            await asyncio.sleep(wait)
+
+    # Hold back every worker for at least the given number of seconds
+    def pause(self, seconds):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
@@ -0,0 +1,76 @@
+import asyncio
+import sys
+import threading
+import time
+from .api_session import API_BASE_URL, get_session
+from .retry_policy import FATAL, TransientError, classify_response
+
+
+# Lazily fetched, self-refreshing client credentials token shared by all workers.
+# Nothing touches the network until the first request asks for a token.
+class TokenManager:
+    def __init__(self, client_key, client_secret, grant_type='client_credentials', refresh_margin=300, base_url=API_BASE_URL):
+        self.token_url = f'{base_url}/v2/oauth/token/'
+        self.client_key = client_key
+        self.client_secret = client_secret
+        self.grant_type = grant_type
+        self.refresh_margin = refresh_margin  # Seconds before expiry at which the token is refreshed
+        self._token = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    # Request a new token from the OAuth endpoint. A body that is not JSON (e.g. a 502 page) or an error status
+    # worth retrying raises TransientError, which the request retry loop backs off on like a network failure.
+    def _fetch(self):
+        response = get_session().post(
+            self.token_url,
+            headers={'Content-Type': 'application/x-www-form-urlencoded', 'Cache-Control': 'no-cache'},
+            data={'client_key': self.client_key, 'client_secret': self.client_secret, 'grant_type': self.grant_type}
+        )
+        try:
+            token_data = response.json()
+        except ValueError:
+            raise TransientError(f"OAuth endpoint answered {response.status_code} with a non-JSON body")
+        token = token_data.get('access_token') if isinstance(token_data, dict) else None
+        if not token and response.status_code >= 400 and classify_response(response, token_data) != FATAL:
+            raise TransientError(f"OAuth endpoint answered {response.status_code}")
+        if not token:
+            print(f"OAuth Error: {token_data.get('error_description', token_data)}", file=sys.stderr)
+            return None, 0.0
+        return token, time.monotonic() + float(token_data.get('expires_in', 7200))
+
+    # Return a valid token, fetching or refreshing it if it is missing or about to expire.
+    # The lock ensures concurrent workers share a single refresh. If an early refresh fails transiently,
+    # the current token is used until it actually expires.
+    def get_token(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._token is None or now >= self._expires_at - self.refresh_margin:
+                try:
+                    self._token, self._expires_at = self._fetch()
+                except TransientError as e:
+                    if self._token is None or now >= self._expires_at:
+                        raise
+                    print(f"Token refresh failed, keeping the current token: {e}", file=sys.stderr)
+            return self._token
+
+    # Async variant that keeps the event loop free while a refresh is in progress
+    async def get_token_async(self):
+        return await asyncio.to_thread(self.get_token)
+
+    # Drop a token the API rejected. Only the first worker to report a given token clears it,
+    # so a burst of 401s still results in one refresh.
+    def invalidate(self, token):
+        with self._lock:
+            if self._token == token:
+                self._token = None
+
+    # POST with a bearer token, refreshing and retrying once if the API answers 401
+    def post(self, url, headers=None, **kwargs):
+        for _ in range(2):
+            token = self.get_token()
+            response = get_session().post(url, headers={**(headers or {}), 'Authorization': f'Bearer {token}'}, **kwargs)
+            if response.status_code != 401:
+                break
+            self.invalidate(token)
+        return response
@@ -0,0 +1,99 @@
+try:
+    import numpy as np
+    import pandas as pd
+except ImportError:  # Analytics are optional
+    np = None
+    pd = None
+
+# Post-crawl aggregates computed with pandas/NumPy over the crawl's own output, and written next to it:
+#   <output>.daily.csv     videos, views and engagement per day of create_time
+#   <output>.hashtags.csv  the same per hashtag, most frequent first
+#   <output>.regions.csv   the same per region_code
+# Engagement is (likes + shares + comments + favorites) / views. Group rates weight every video by its
+# views; median_engagement_rate is the typical video's rate. Counters missing from the output are skipped.
+
+ENGAGEMENT_FIELDS = ['like_count', 'share_count', 'comment_count', 'favorites_count']
+ANALYTICS_FIELDS = ['create_time', 'region_code', 'hashtag_names', 'view_count', *ENGAGEMENT_FIELDS]
+
+# Summed per group, under these column names
+TOTALS = {
+    'view_count': 'views',
+    'like_count': 'likes',
+    'share_count': 'shares',
+    'comment_count': 'comments',
+    'favorites_count': 'favorites',
+    'engagements': 'engagements',
+}
+
+
+# Load only the columns analytics use from a crawl's output ('csv' file or 'parquet' dataset directory)
+def load_output(output_format, path, columns):
+    usecols = [column for column in ANALYTICS_FIELDS if column in columns]
+    if output_format == 'parquet':
+        videos = pd.read_parquet(path, columns=usecols)
+    else:
+        videos = pd.read_csv(path, usecols=usecols)
+        if 'hashtag_names' in videos:
+            # The CSV holds each list as its repr, e.g. "['tag1', 'tag2']"; hashtags never contain quotes or commas
+            hashtags = videos['hashtag_names'].fillna('[]').str.slice(2, -2).str.split("', '")
+            videos['hashtag_names'] = hashtags.map(lambda tags: [tag for tag in tags if tag])
+    if 'create_time' in videos and not pd.api.types.is_datetime64_any_dtype(videos['create_time']):
+        videos['create_time'] = pd.to_datetime(videos['create_time'], unit='s')
+    return videos
+
+
+# Per-video engagement: the summed engagement counters and their rate against views (NaN without views)
+def add_engagement(videos):
+    engagement_fields = [field for field in ENGAGEMENT_FIELDS if field in videos]
+    if not engagement_fields or 'view_count' not in videos:
+        return videos
+    engagements = videos[engagement_fields].fillna(0).to_numpy(dtype=np.int64).sum(axis=1)
+    views = videos['view_count'].fillna(0).to_numpy(dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rates = np.where(views > 0, engagements / views, np.nan)
+    return videos.assign(engagements=engagements, engagement_rate=rates)
+
+
+# Volume and engagement for each value of a grouping key
+def aggregate_by(videos, key):
+    aggregations = {'videos': (key, 'size')}
+    for field, total in TOTALS.items():
+        if field in videos:
+            aggregations[total] = (field, 'sum')
+    if 'engagement_rate' in videos:
+        aggregations['median_engagement_rate'] = ('engagement_rate', 'median')
+    grouped = videos.groupby(key).agg(**aggregations)
+    if 'engagements' in grouped and 'views' in grouped:
+        grouped['engagement_rate'] = grouped['engagements'] / grouped['views'].where(grouped['views'] > 0)
+    return grouped
+
+
+def daily_volume(videos):
+    return aggregate_by(videos.assign(date=videos['create_time'].dt.date), 'date')
+
+
+def hashtag_frequency(videos):
+    hashtags = videos.explode('hashtag_names').dropna(subset=['hashtag_names'])
+    return aggregate_by(hashtags.rename(columns={'hashtag_names': 'hashtag'}), 'hashtag').sort_values('videos', ascending=False)
+
+
+def region_engagement(videos):
+    return aggregate_by(videos, 'region_code').sort_values('videos', ascending=False)
+
+
+# Compute every aggregate the output's columns allow and write each next to it; returns the written paths
+def write_analytics(output_format, output_path, columns):
+    if pd is None:
+        raise ImportError("Analytics require pandas and numpy (pip install pandas)")
+    data_path = f'{output_path}.csv' if output_format == 'csv' else output_path
+    videos = add_engagement(load_output(output_format, data_path, columns))
+
+    written = []
+    for suffix, field, aggregate in [('daily', 'create_time', daily_volume),
+                                     ('hashtags', 'hashtag_names', hashtag_frequency),
+                                     ('regions', 'region_code', region_engagement)]:
+        if field in videos:
+            aggregate_path = f'{output_path}.{suffix}.csv'
+            aggregate(videos).to_csv(aggregate_path)
+            written.append(aggregate_path)
+    return written
@@ -0,0 +1,96 @@
+import hashlib
+import math
+import sqlite3
+import threading
+
+
+# Fixed-size probabilistic set for very large crawls. It never misses a repeat,
+# but about error_rate of new ids are wrongly reported as already seen.
+class BloomFilter:
+    def __init__(self, capacity, error_rate=0.001):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(str(key).encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    # Add a key, returning True if it was (probably) already present
+    def add(self, key):
+        seen = True
+        for position in self._positions(key):
+            byte, bit = divmod(position, 8)
+            if not self._bits[byte] & (1 << bit):
+                seen = False
+                self._bits[byte] |= 1 << bit
+        return seen
+
+
+# Index of video ids already written, used to drop repeats across pages and windows.
+# Backed by an in-memory set by default, an SQLite file when path is given, or a Bloom filter sized for
+# bloom_capacity ids. Duplicates are counted per window.
+# The SQLite file is reset on open unless resume is set. A resumed run writes its output again from the
+# first window, so ids kept from the interrupted run stay owned by the window that first wrote them:
+# that window writes them again, and any other window still drops them.
+class SeenVideoIndex:
+    def __init__(self, path=None, bloom_capacity=None, error_rate=0.001, resume=False):
+        self.duplicates_by_window = {}
+        self._lock = threading.Lock()
+        self._ids = None
+        self._bloom = None
+        self._conn = None
+        if path is not None:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            columns = [column[1] for column in self._conn.execute('PRAGMA table_info(seen)')]
+            if not resume or columns != ['id', 'window', 'earlier_run']:
+                self._conn.execute('DROP TABLE IF EXISTS seen')
+                self._conn.execute('CREATE TABLE seen (id INTEGER PRIMARY KEY, window TEXT, earlier_run INTEGER NOT NULL)')
+            self._conn.execute('UPDATE seen SET earlier_run = 1')
+            self._conn.commit()
+        elif bloom_capacity is not None:
+            self._bloom = BloomFilter(bloom_capacity, error_rate)
+        else:
+            self._ids = set()
+
+    # Return the videos whose id has not been seen before, recording the rest as duplicates of the window
+    def add_new(self, videos, window=None):
+        new_videos = []
+        with self._lock:
+            for video in videos:
+                video_id = video['id']
+                if self._ids is not None:
+                    seen = video_id in self._ids
+                    self._ids.add(video_id)
+                elif self._bloom is not None:
+                    seen = self._bloom.add(video_id)
+                else:
+                    seen = self._add_to_table(video_id, window)
+                if not seen:
+                    new_videos.append(video)
+            if self._conn is not None:
+                self._conn.commit()
+            duplicates = len(videos) - len(new_videos)
+            if duplicates:
+                self.duplicates_by_window[window] = self.duplicates_by_window.get(window, 0) + duplicates
+        return new_videos
+
+    # Record an id in the SQLite table, returning True if this run has already written it or it belongs to another window
+    def _add_to_table(self, video_id, window):
+        window_key = '-'.join(window) if window else None
+        if self._conn.execute('INSERT OR IGNORE INTO seen VALUES (?, ?, 0)', (video_id, window_key)).rowcount:
+            return False
+        # Written by the interrupted run: this run writes it again from the window that owns it
+        return self._conn.execute('UPDATE seen SET earlier_run = 0 WHERE id = ? AND earlier_run = 1 AND window IS ?',
+                                  (video_id, window_key)).rowcount == 0
+
+    @property
+    def duplicate_count(self):
+        return sum(self.duplicates_by_window.values())
+
+    def close(self):
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
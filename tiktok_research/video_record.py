@@ -0,0 +1,60 @@
+import sys
+from .query_planner import VIDEO_FIELDS
+
+_FIELD_NAMES = frozenset(VIDEO_FIELDS)
+_MISSING = object()
+
+# Short values repeated across many videos; each distinct value is stored once
+INTERNED_FIELDS = frozenset(('region_code',))
+INTERNED_LIST_FIELDS = frozenset(('hashtag_names', 'effect_ids'))
+
+
+# Compact in-memory form of one video: a __slots__ object instead of a 17-key dict, with region codes,
+# hashtags and effect ids interned. Fields left out by projection are simply unset, and fields the API
+# adds later are kept in a small side dict. It reads like a dict (get, [], in), so filters, sinks and
+# the de-duplication index work on it unchanged; to_dict converts it only at the output boundary.
+class VideoRecord:
+    __slots__ = (*VIDEO_FIELDS, '_extra')
+
+    def __init__(self, fields):
+        extra = None
+        for name, value in fields.items():
+            if name in _FIELD_NAMES:
+                if name in INTERNED_LIST_FIELDS and value:
+                    value = [sys.intern(item) if isinstance(item, str) else item for item in value]
+                elif name in INTERNED_FIELDS and isinstance(value, str):
+                    value = sys.intern(value)
+                setattr(self, name, value)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[name] = value
+        self._extra = extra
+
+    def get(self, name, default=None):
+        if name in _FIELD_NAMES:
+            return getattr(self, name, default)
+        return self._extra.get(name, default) if self._extra else default
+
+    def __getitem__(self, name):
+        value = self.get(name, _MISSING)
+        if value is _MISSING:
+            raise KeyError(name)
+        return value
+
+    def __contains__(self, name):
+        return self.get(name, _MISSING) is not _MISSING
+
+    def to_dict(self):
+        video = {name: getattr(self, name) for name in VIDEO_FIELDS if hasattr(self, name)}
+        if self._extra:
+            video.update(self._extra)
+        return video
+
+    def __repr__(self):
+        return f'VideoRecord({self.to_dict()!r})'
+
+
+# Plain dict for a video in either form, for JSON output and checkpoints
+def video_to_dict(video):
+    return video.to_dict() if isinstance(video, VideoRecord) else video
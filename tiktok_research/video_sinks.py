@@ -0,0 +1,281 @@
+import csv
+import glob
+import itertools
+import os
+import shutil
+import threading
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet output is optional
+    pa = None
+    pc = None
+    pq = None
+
+
+# Public URL of a video. Built only when a video is written out, so filtering never copies records.
+def video_url(video):
+    return f"https://www.tiktok.com/@{video['username']}/video/{video['id']}"
+
+
+# Values of one output column for a batch of videos, with the url column derived on the fly
+def _column_values(videos, name):
+    if name == 'url':
+        return [video_url(video) for video in videos]
+    return [video.get(name) for video in videos]
+
+
+# Streams filtered videos to a CSV file as they arrive instead of building one DataFrame at the end.
+# Values are written the way pandas' to_csv writes them (lists as their repr, None as an empty field),
+# and the file is flushed every flush_every rows so partial results reach disk during a crawl.
+class CsvVideoSink:
+    def __init__(self, path, column_order, flush_every=1000):
+        self.path = path
+        self.column_order = column_order
+        self.flush_every = flush_every
+        self.rows_written = 0
+        self._rows_since_flush = 0
+        self._lock = threading.Lock()
+        self._file = open(path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file, lineterminator='\n')
+        self._writer.writerow(column_order)
+
+    # Append a page (or window) of filtered videos. The window is only used by partitioned sinks.
+    def write_videos(self, videos, window=None):
+        rows = zip(*(_column_values(videos, name) for name in self.column_order))
+        with self._lock:
+            self._writer.writerows(rows)
+            self.rows_written += len(videos)
+            self._rows_since_flush += len(videos)
+            if self._rows_since_flush >= self.flush_every:
+                self._file.flush()
+                self._rows_since_flush = 0
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+# Typed Arrow schema for the video fields; anything not listed here is stored as a string
+def _video_field_type(name):
+    if pa is None:
+        return None
+    return {
+        "id": pa.int64(),
+        "music_id": pa.int64(),
+        "playlist_id": pa.int64(),
+        "create_time": pa.timestamp('s'),
+        "favorites_count": pa.int64(),
+        "share_count": pa.int64(),
+        "comment_count": pa.int64(),
+        "like_count": pa.int64(),
+        "view_count": pa.int64(),
+        "video_duration": pa.int64(),
+        "is_stem_verified": pa.bool_(),
+        "hashtag_names": pa.list_(pa.string()),
+        "effect_ids": pa.list_(pa.string()),
+    }.get(name, pa.string())
+
+
+# Writes filtered videos as a Parquet dataset partitioned by crawl date window
+# (<path>/window=YYYYMMDD-YYYYMMDD/part-0.parquet), with int64 ids, list<string> hashtags
+# and timestamp create_time, so reloads can filter on partitions and columns without re-parsing CSV.
+# Writes are buffered into row groups of up to ROW_GROUP_ROWS rows, so page-by-page writes do not make tiny
+# row groups, and only the window being written has an open file. Like a CSV output, an existing dataset at path is
+# replaced: its partitions are dropped on open, so windows of an earlier run cannot linger next to the new ones.
+class ParquetVideoSink:
+    ROW_GROUP_ROWS = 10000
+
+    def __init__(self, path, column_order):
+        if pa is None:
+            raise ImportError("Parquet output requires pyarrow (pip install pyarrow)")
+        self.path = path
+        self.column_order = column_order
+        self.schema = pa.schema([(name, _video_field_type(name)) for name in column_order])
+        self.rows_written = 0
+        self._partition = None
+        self._writer = None
+        self._buffer = []
+        self._buffered_rows = 0
+        self._part_counts = {}  # Files written to each partition so far
+        self._lock = threading.Lock()
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        os.makedirs(path)
+
+    # Append a page (or window) of filtered videos to the partition of the given (start_date, end_date) window.
+    # Windows are written one after another: moving on to another partition closes the current one's file
+    # (a partition written to again later gets a new part-N file).
+    def write_videos(self, videos, window=None):
+        if not videos:
+            return
+        table = pa.Table.from_pydict(
+            {name: _column_values(videos, name) for name in self.column_order},
+            schema=self.schema
+        )
+        partition = f"window={window[0]}-{window[1]}" if window else "window=all"
+        with self._lock:
+            if partition != self._partition:
+                self._close_partition()
+                self._partition = partition
+            self._buffer.append(table)
+            self._buffered_rows += len(videos)
+            self.rows_written += len(videos)
+            if self._buffered_rows >= self.ROW_GROUP_ROWS:
+                self._flush()
+
+    # Write the buffered pages of the current partition as one row group (with the lock held)
+    def _flush(self):
+        if not self._buffer:
+            return
+        if self._writer is None:
+            partition_path = os.path.join(self.path, self._partition)
+            os.makedirs(partition_path, exist_ok=True)
+            part_number = self._part_counts.get(self._partition, 0)
+            self._part_counts[self._partition] = part_number + 1
+            self._writer = pq.ParquetWriter(os.path.join(partition_path, f'part-{part_number}.parquet'), self.schema)
+        self._writer.write_table(pa.concat_tables(self._buffer))
+        self._buffer = []
+        self._buffered_rows = 0
+
+    def _close_partition(self):
+        self._flush()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def close(self):
+        with self._lock:
+            self._close_partition()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+# Open the sink for an output format: 'csv' writes <path>.csv, 'parquet' writes a dataset directory at <path>
+def open_video_sink(output_format, path, column_order):
+    if output_format == 'csv':
+        return CsvVideoSink(f'{path}.csv', column_order)
+    if output_format == 'parquet':
+        return ParquetVideoSink(path, column_order)
+    raise ValueError(f"Unknown output format: {output_format}")
+
+
+# Move a written output (a CSV file or Parquet dataset directory) to path, replacing whatever is there
+def move_video_output(written_path, path):
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    os.replace(written_path, path)
+
+
+# Column that identifies a video in a written output, for merging
+def _identity_column(column_order):
+    for name in ('id', 'url'):
+        if name in column_order:
+            return name
+    raise ValueError("Merging into an existing output needs an id or url column")
+
+
+# Merge a CSV increment into an existing CSV output: rows of videos the increment holds again are replaced
+# by its rows (with updated counts), everything else is kept. Both files are streamed; only the increment's
+# ids are held in memory. Returns the number of rows replaced.
+def _merge_csv(increment_path, path, column_order):
+    id_index = column_order.index(_identity_column(column_order))
+    with open(increment_path, newline='', encoding='utf-8') as increment_file:
+        increment_ids = {row[id_index] for row in itertools.islice(csv.reader(increment_file), 1, None)}
+
+    replaced = 0
+    merged_path = f'{path}.merging'
+    with open(path, newline='', encoding='utf-8') as existing_file, open(merged_path, 'w', newline='', encoding='utf-8') as merged_file:
+        existing_rows = csv.reader(existing_file)
+        if next(existing_rows, None) != column_order:
+            raise ValueError(f"{path} has different columns; merge needs the same --columns as earlier runs")
+        writer = csv.writer(merged_file, lineterminator='\n')
+        writer.writerow(column_order)
+        for row in existing_rows:
+            if row[id_index] in increment_ids:
+                replaced += 1
+            else:
+                writer.writerow(row)
+        with open(increment_path, newline='', encoding='utf-8') as increment_file:
+            writer.writerows(itertools.islice(csv.reader(increment_file), 1, None))
+    os.replace(merged_path, path)
+    os.remove(increment_path)
+    return replaced
+
+
+# (start_date, end_date) as YYYYMMDD strings of the window=START-END partition holding a file, or None for a
+# partition without a date window (window=all)
+def _partition_window(file):
+    start_date, separator, end_date = os.path.basename(os.path.dirname(file))[len('window='):].partition('-')
+    return (start_date, end_date) if separator else None
+
+
+# Merge a Parquet increment dataset into an existing one: existing partition files lose the rows of videos
+# the increment holds again, and the increment's files join the dataset next to them. A video is fetched again
+# in a window covering its create_time, so only existing partitions overlapping one of the increment's windows
+# are read. Returns the number of rows replaced.
+def _merge_parquet(increment_path, path, column_order):
+    id_column = _identity_column(column_order)
+    increment_files = sorted(glob.glob(os.path.join(increment_path, 'window=*', '*.parquet')))
+    increment_ids = pa.chunked_array([pq.read_table(file, columns=[id_column])[id_column] for file in increment_files],
+                                     type=_video_field_type(id_column)).unique()
+    increment_windows = {_partition_window(file) for file in increment_files}
+
+    # Whether an existing file may hold videos of the increment
+    def overlaps_increment(file):
+        window = _partition_window(file)
+        if window is None or None in increment_windows:
+            return True
+        return any(start_date <= window[1] and window[0] <= end_date for start_date, end_date in increment_windows)
+
+    replaced = 0
+    for file in filter(overlaps_increment, glob.glob(os.path.join(path, 'window=*', '*.parquet'))):
+        table = pq.read_table(file)
+        if table.column_names != column_order:
+            raise ValueError(f"{file} has different columns; merge needs the same --columns as earlier runs")
+        kept = table.filter(pc.invert(pc.is_in(table[id_column], value_set=increment_ids)))
+        if kept.num_rows < table.num_rows:
+            replaced += table.num_rows - kept.num_rows
+            if kept.num_rows:
+                pq.write_table(kept, file)
+            else:
+                os.remove(file)
+
+    for file in increment_files:
+        partition_path = os.path.join(path, os.path.basename(os.path.dirname(file)))
+        os.makedirs(partition_path, exist_ok=True)
+        part_number = len(glob.glob(os.path.join(partition_path, 'part-*.parquet')))
+        while os.path.exists(os.path.join(partition_path, f'part-{part_number}.parquet')):
+            part_number += 1
+        os.replace(file, os.path.join(partition_path, f'part-{part_number}.parquet'))
+    shutil.rmtree(increment_path)
+    return replaced
+
+
+# Merge the output written at increment_path into the output at path (same format and columns as open_video_sink
+# writes them), replacing videos fetched again. Without an existing output the increment simply becomes it.
+# Returns the number of existing rows replaced.
+def merge_video_output(output_format, increment_path, path, column_order):
+    if output_format == 'csv':
+        increment_path, path = f'{increment_path}.csv', f'{path}.csv'
+    elif output_format != 'parquet':
+        raise ValueError(f"Unknown output format: {output_format}")
+    if not os.path.exists(path):
+        os.replace(increment_path, path)
+        return 0
+    if output_format == 'csv':
+        return _merge_csv(increment_path, path, column_order)
+    return _merge_parquet(increment_path, path, column_order)
@@ -0,0 +1,106 @@
+import datetime
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from .crawler import plan_date_windows
+
+
+# Key of a crawl in the store: the query sent to the API, the client-side filter and the output it is merged into,
+# so the same keywords with another filter, or written to another dataset, are tracked separately
+def crawl_key(query, filter_conditions, output):
+    crawl = {'query': query, 'filter': filter_conditions, 'output': output}
+    return hashlib.sha256(json.dumps(crawl, sort_keys=True).encode()).hexdigest()
+
+
+# Persistent state of scheduled incremental crawls, kept per crawl key in one SQLite file: the high-watermark
+# (latest create_time written to the dataset so far) and the manifest of date windows completed by earlier runs.
+class WatermarkStore:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS watermarks (
+                crawl_key TEXT PRIMARY KEY,
+                max_create_time INTEGER,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS windows (
+                crawl_key TEXT NOT NULL,
+                start_date TEXT NOT NULL,
+                end_date TEXT NOT NULL,
+                completed_at REAL NOT NULL,
+                PRIMARY KEY (crawl_key, start_date, end_date)
+            );
+        ''')
+        self._conn.commit()
+
+    # Latest create_time (epoch seconds) recorded for a crawl, or None before its first run
+    def watermark(self, key):
+        with self._lock:
+            row = self._conn.execute('SELECT max_create_time FROM watermarks WHERE crawl_key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    # (start_date, end_date) of every window completed for a crawl
+    def completed_windows(self, key):
+        with self._lock:
+            rows = self._conn.execute('SELECT start_date, end_date FROM windows WHERE crawl_key = ?', (key,)).fetchall()
+        return [(datetime.datetime.strptime(start_date, "%Y%m%d"), datetime.datetime.strptime(end_date, "%Y%m%d"))
+                for start_date, end_date in rows]
+
+    # Record a finished run: its windows join the manifest and the watermark moves up to max_create_time
+    def record_run(self, key, windows, max_create_time):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO windows VALUES (?, ?, ?, ?)',
+                [(key, start_date.strftime("%Y%m%d"), end_date.strftime("%Y%m%d"), now) for start_date, end_date in windows]
+            )
+            self._conn.execute('''
+                INSERT INTO watermarks VALUES (?, ?, ?)
+                ON CONFLICT (crawl_key) DO UPDATE SET
+                    max_create_time = MAX(COALESCE(max_create_time, excluded.max_create_time), COALESCE(excluded.max_create_time, max_create_time)),
+                    updated_at = excluded.updated_at
+            ''', (key, max_create_time, now))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# Day from which an incremental run re-crawls days it already has, to pick up updated counts: the last
+# recrawl_days days up to the watermark's day. None (nothing re-crawled) without a watermark or recrawl days.
+def recrawl_start(watermark, recrawl_days):
+    if watermark is None or not recrawl_days:
+        return None
+    watermark_day = datetime.datetime.fromtimestamp(watermark).replace(hour=0, minute=0, second=0, microsecond=0)
+    return watermark_day - datetime.timedelta(days=recrawl_days - 1)
+
+
+# Windows an incremental run still has to fetch between start_date and end_date: every day not covered by
+# a completed window, plus every day from recrawl_from on, planned into windows the way plan_date_windows does
+def plan_incremental_windows(start_date, end_date, completed_windows, recrawl_from=None):
+    covered = set()
+    for window_start, window_end in completed_windows:
+        day = window_start
+        while day <= window_end and (recrawl_from is None or day < recrawl_from):
+            covered.add(day)
+            day += datetime.timedelta(days=1)
+
+    windows = []
+    gap_start = None
+    day = start_date
+    while day <= end_date:
+        if day in covered:
+            if gap_start is not None:
+                windows.extend(plan_date_windows(gap_start, day - datetime.timedelta(days=1)))
+                gap_start = None
+        elif gap_start is None:
+            gap_start = day
+        day += datetime.timedelta(days=1)
+    if gap_start is not None:
+        windows.extend(plan_date_windows(gap_start, end_date))
+    return windows